@@ -0,0 +1,2 @@
+sh configure_env.sh
+python database/convert_data.py resources
\ No newline at end of file
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import shutil
+
+from database.config import EXCHANGE_DATA
+from database.data_alignment import get_exchanges
+import numpy as np
+
+CACHE_DIR = "cache"
+
+
+def get_cache_dir(database_dir, coin):
+    return os.path.join(database_dir, CACHE_DIR, coin)
+
+
+def get_cache_key(database_dir, coin, accept_interval=120):
+    """ Hash the data files and exchange limits of a coin. """
+
+    # Imported here, since sample_generator reads from the cache.
+    from database.data_generator import get_data_paths
+
+    sources = []
+
+    for exchange in get_exchanges(coin):
+        files = []
+        for tfrecord_path in get_data_paths(database_dir, exchange, coin):
+            stat = os.stat(tfrecord_path)
+            files.append([os.path.basename(tfrecord_path), stat.st_size,
+                          stat.st_mtime_ns])
+
+        sources.append([exchange, EXCHANGE_DATA[exchange]["limit"], files])
+
+    key = json.dumps([coin, accept_interval, sources])
+
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def build_aligned(database_dir, coin, accept_interval=120):
+    """ Save the samples of sample_generator for a coin to the cache. """
+
+    from database.data_generator import sample_generator
+
+    cache_dir = get_cache_dir(database_dir, coin)
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+
+    key = get_cache_key(database_dir, coin, accept_interval)
+    levels = sum([EXCHANGE_DATA[exchange]["limit"]
+                  for exchange in get_exchanges(coin)])
+    timestamps = []
+
+    # Written under temporary names, so concurrent runs never read halves.
+    suffix = ".%d.tmp" % os.getpid()
+    data_path = os.path.join(cache_dir, "data.npy")
+
+    # Samples are appended to a raw file, since their number is unknown
+    # until data ends.
+    with open(data_path + suffix + ".raw", "wb") as raw_file:
+        for x, timestamp in sample_generator(database_dir, coin,
+                                             accept_interval):
+            raw_file.write(np.ascontiguousarray(x, dtype=np.float32).data)
+            timestamps.append(timestamp)
+
+    with open(data_path + suffix, "wb") as data_file:
+        np.lib.format.write_array_header_1_0(data_file, {
+            "descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+            "fortran_order": False,
+            "shape": (len(timestamps), levels, 4)})
+
+        with open(data_path + suffix + ".raw", "rb") as raw_file:
+            shutil.copyfileobj(raw_file, data_file)
+
+    os.remove(data_path + suffix + ".raw")
+    os.replace(data_path + suffix, data_path)
+
+    timestamp_path = os.path.join(cache_dir, "timestamp.npy")
+    with open(timestamp_path + suffix, "wb") as timestamp_file:
+        np.save(timestamp_file, np.array(timestamps, dtype=np.int64))
+    os.replace(timestamp_path + suffix, timestamp_path)
+
+    meta_path = os.path.join(cache_dir, "meta.json")
+    with open(meta_path + suffix, "w") as meta_file:
+        json.dump({"key": key, "accept_interval": accept_interval},
+                  meta_file)
+    os.replace(meta_path + suffix, meta_path)
+
+
+def load_aligned(database_dir, coin, accept_interval=120):
+    """ Memory map the (time, levels, 4) samples and timestamps of a coin,
+    rebuilding the cache when data files or exchange limits changed.
+    """
+
+    cache_dir = get_cache_dir(database_dir, coin)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    key = get_cache_key(database_dir, coin, accept_interval)
+    meta = dict()
+
+    if os.path.exists(meta_path):
+        with open(meta_path) as meta_file:
+            meta = json.load(meta_file)
+
+    if meta.get("key") != key:
+        build_aligned(database_dir, coin, accept_interval)
+
+    data = np.load(os.path.join(cache_dir, "data.npy"), mmap_mode="r")
+    timestamps = np.load(os.path.join(cache_dir, "timestamp.npy"))
+
+    return data, timestamps
+
+
+def cached_sample_generator(database_dir, coin, accept_interval=120,
+                            start=None, end=None):
+    """ Generate the samples of sample_generator for a coin from the cache.
+    """
+
+    data, timestamps = load_aligned(database_dir, coin, accept_interval)
+    first = 0 if start is None else \
+        int(np.searchsorted(timestamps, start, side='left'))
+    last = len(timestamps) if end is None else \
+        int(np.searchsorted(timestamps, end, side='right'))
+
+    for i in range(first, last):
+        yield data[i], int(timestamps[i])
@@ -0,0 +1,174 @@
+import os
+from glob import glob
+
+import numpy as np
+
+COLUMN_KEYS = ['timestamp', 'ask_price', 'ask_qty', 'bid_price', 'bid_qty']
+COLUMN_DIR = "columns"
+
+
+def pad_levels(values, levels):
+    """ Pad levels repeating the last value, or truncate them. """
+
+    if len(values) >= levels:
+        return values[:levels]
+
+    return np.hstack((values, np.repeat(values[len(values) - 1],
+                                        levels - len(values))))
+
+
+class ColumnSeries:
+    """ Columns of an exchange/coin pair, concatenated over days. """
+
+    def __init__(self, days):
+        self.days = days
+        sizes = [len(day["timestamp"]) for day in days]
+        self.offsets = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+
+        if len(days) > 0:
+            self.timestamp = np.concatenate(
+                [day["timestamp"] for day in days])
+            self.levels = days[0]["ask_price"].shape[1]
+        else:
+            self.timestamp = np.zeros(0, dtype=np.int64)
+            self.levels = 0
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def search(self, start=None, end=None):
+        """ Get index range [first, last) of records inside [start, end]. """
+
+        first = 0 if start is None else \
+            int(np.searchsorted(self.timestamp, start, side='left'))
+        last = len(self) if end is None else \
+            int(np.searchsorted(self.timestamp, end, side='right'))
+
+        return first, max(first, last)
+
+    def get(self, key, first=0, last=None):
+        """ Get records [first, last) of a column.
+
+        A range inside one day is returned as a view of the memory map.
+        """
+
+        if last is None:
+            last = len(self)
+
+        if key == "timestamp":
+            return self.timestamp[first:last]
+
+        if first >= last:
+            return np.zeros((0, self.levels), dtype=np.float32)
+
+        day_first = int(np.searchsorted(self.offsets, first, side='right')) - 1
+        day_last = int(np.searchsorted(self.offsets, last, side='left')) - 1
+        day_first = max(day_first, 0)
+        day_last = max(day_last, day_first)
+
+        parts = []
+        for day in range(day_first, day_last + 1):
+            offset = self.offsets[day]
+            parts.append(self.days[day][key][
+                max(first - offset, 0):max(last - offset, 0)])
+
+        if len(parts) == 1:
+            return parts[0]
+
+        return np.concatenate(parts)
+
+    def take(self, indices):
+        """ Get records as (len(indices), levels, 4) matrices.
+
+        Columns are stacked as ask_price, ask_qty, bid_price, bid_qty, the
+        same layout yielded by sample_generator for one exchange.
+        """
+
+        indices = np.asarray(indices, dtype=np.int64)
+        result = np.empty((len(indices), self.levels, 4), dtype=np.float32)
+        day_index = np.searchsorted(self.offsets, indices, side='right') - 1
+
+        for day in np.unique(day_index):
+            mask = day_index == day
+            rows = indices[mask] - self.offsets[day]
+
+            for i, key in enumerate(COLUMN_KEYS[1:]):
+                result[mask, :, i] = self.days[day][key][rows]
+
+        return result
+
+
+class ColumnStore:
+    """ Fixed-width columnar orderbook store readable with np.memmap.
+
+    Each exchange/coin/day is saved as one .npy file per column in
+    <database_dir>/<exchange>/<coin>/columns/<day>_<column>.npy, where day
+    is the number of days since epoch. Timestamps are int64 of shape (n,)
+    and the orderbook columns are float32 of shape (n, levels).
+    """
+
+    def __init__(self, database_dir):
+        self.database_dir = database_dir
+
+    def get_dir(self, exchange, coin):
+        return os.path.join(self.database_dir, exchange, coin, COLUMN_DIR)
+
+    def get_path(self, exchange, coin, day, key):
+        return os.path.join(self.get_dir(exchange, coin),
+                            "%d_%s.npy" % (day, key))
+
+    def get_days(self, exchange, coin):
+        """ Get days saved for an exchange/coin pair. """
+
+        paths = glob(os.path.join(self.get_dir(exchange, coin),
+                                  "*_%s.npy" % COLUMN_KEYS[0]))
+        days = [int(os.path.basename(path).split("_")[0]) for path in paths]
+
+        return sorted(days)
+
+    def write(self, exchange, coin, day, data):
+        """ Write the columns of a day, replacing previous ones. """
+
+        database_dir = self.get_dir(exchange, coin)
+        if not os.path.exists(database_dir):
+            os.makedirs(database_dir, exist_ok=True)
+
+        order = np.argsort(data["timestamp"], kind='stable')
+        for key in COLUMN_KEYS:
+            dtype = np.int64 if key == "timestamp" else np.float32
+            values = np.asarray(data[key], dtype=dtype)[order]
+            path = self.get_path(exchange, coin, day, key)
+
+            with open(path + ".tmp", "wb") as column_file:
+                np.save(column_file, values)
+            os.replace(path + ".tmp", path)
+
+    def open_day(self, exchange, coin, day):
+        """ Memory map the columns of a day. """
+
+        data = dict()
+        for key in COLUMN_KEYS:
+            data[key] = np.load(self.get_path(exchange, coin, day, key),
+                                mmap_mode='r')
+
+        return data
+
+    def open(self, exchange, coin):
+        """ Memory map all days of an exchange/coin pair. """
+
+        days = [self.open_day(exchange, coin, day)
+                for day in self.get_days(exchange, coin)]
+
+        return ColumnSeries(days)
+
+    def read(self, exchange, coin, start=None, end=None):
+        """ Read columns of the records inside [start, end]. """
+
+        series = self.open(exchange, coin)
+        first, last = series.search(start, end)
+
+        data = dict()
+        for key in COLUMN_KEYS:
+            data[key] = series.get(key, first, last)
+
+        return data
@@ -0,0 +1,77 @@
+import argparse
+
+from database.column_store import COLUMN_KEYS, ColumnStore, pad_levels
+from database.config import EXCHANGE_DATA
+from database.data_generator import data_generator
+import numpy as np
+
+
+def convert_data(database_dir, exchange, coin, output_dir=None):
+    """ Convert the tfrecords of an exchange/coin pair to columns. """
+
+    if output_dir is None:
+        output_dir = database_dir
+
+    store = ColumnStore(output_dir)
+    levels = EXCHANGE_DATA[exchange]["limit"]
+    columns, day_index, converted_days = (None, None, set())
+
+    def flush():
+        data = dict()
+        for key in COLUMN_KEYS:
+            data[key] = np.array(columns[key])
+
+        if day_index in converted_days:
+            # Records of a day split in unordered files.
+            previous = store.open_day(exchange, coin, day_index)
+            for key in COLUMN_KEYS:
+                data[key] = np.concatenate((previous[key], data[key]))
+
+        store.write(exchange, coin, day_index, data)
+        converted_days.add(day_index)
+
+    for data in data_generator(database_dir, exchange, coin):
+        current_day_index = int(data["timestamp"] / 86400)
+
+        if current_day_index != day_index:
+            if columns is not None:
+                flush()
+
+            day_index = current_day_index
+            columns = dict([(key, []) for key in COLUMN_KEYS])
+
+        columns["timestamp"].append(data["timestamp"])
+        for key in COLUMN_KEYS[1:]:
+            columns[key].append(pad_levels(data[key], levels))
+
+    if columns is not None:
+        flush()
+
+    return len(converted_days)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Convert tfrecords to columnar data')
+    parser.add_argument('database_dir', type=str,
+                        help='directory where data will be read')
+    parser.add_argument('exchange', type=str, nargs='?',
+                        default="", help='exchange used to convert data')
+    parser.add_argument('coin', type=str, nargs='?',
+                        default="", help='coin used to convert data')
+    parser.add_argument('--output_dir', type=str, default=None,
+                        help='directory where columns will be saved')
+    args = parser.parse_args()
+    database_dir = str(args.database_dir)
+    exchange = args.exchange
+    coin = args.coin
+
+    if exchange == "" or coin == "":
+        pairs = [(exchange, coin) for exchange in EXCHANGE_DATA
+                 for coin in EXCHANGE_DATA[exchange]["coins"]]
+    else:
+        pairs = [(exchange, coin)]
+
+    for exchange, coin in pairs:
+        days = convert_data(database_dir, exchange, coin, args.output_dir)
+        print("[%s] %s - %d days converted." % (exchange, coin, days))
@@ -0,0 +1,119 @@
+from database.column_store import ColumnStore
+from database.config import EXCHANGE_DATA
+import numpy as np
+
+
+def get_exchanges(coin):
+    """ Get exchanges trading a coin, in the sample_generator order. """
+
+    return [exchange for exchange in EXCHANGE_DATA
+            if coin in EXCHANGE_DATA[exchange]["coins"]]
+
+
+def align_timestamps(timestamps, accept_interval=120, reference=0):
+    """ Match records of many streams by timestamp (merge-asof).
+
+    Each record of the reference stream is matched with the latest record
+    of every other stream that is not newer and at most accept_interval
+    seconds older. Reference records without a match in every stream are
+    dropped. Returns the matched reference timestamps (n,) and the record
+    indices (n, streams).
+    """
+
+    anchors = np.asarray(timestamps[reference])
+    indices = np.empty((len(anchors), len(timestamps)), dtype=np.int64)
+    valid = np.ones(len(anchors), dtype=bool)
+
+    for i, stream in enumerate(timestamps):
+        stream = np.asarray(stream)
+
+        if i == reference:
+            indices[:, i] = np.arange(len(anchors))
+            continue
+
+        index = np.searchsorted(stream, anchors, side='right') - 1
+        valid &= index >= 0
+        index = np.maximum(index, 0)
+
+        if len(stream) > 0:
+            valid &= anchors - stream[index] <= accept_interval
+        else:
+            valid[:] = False
+
+        indices[:, i] = index
+
+    return anchors[valid], indices[valid]
+
+
+def align_columns(database_dir, coin, accept_interval=120, start=None,
+                  end=None):
+    """ Align the column store series of every exchange of a coin.
+
+    Returns the series, the record indices (n, exchanges) into them and the
+    (n,) aligned timestamps.
+    """
+
+    store = ColumnStore(database_dir)
+    series, offsets, timestamps = ([], [], [])
+
+    for exchange in get_exchanges(coin):
+        exchange_series = store.open(exchange, coin)
+        levels = EXCHANGE_DATA[exchange]["limit"]
+
+        if len(exchange_series) > 0 and exchange_series.levels != levels:
+            raise ValueError(
+                "Columns of %s %s have %d levels, expected %d." % (
+                    exchange, coin, exchange_series.levels, levels))
+
+        first, last = exchange_series.search(start, end)
+        series.append(exchange_series)
+        offsets.append(first)
+        timestamps.append(exchange_series.timestamp[first:last])
+
+    if len(series) == 0:
+        return series, np.zeros((0, 0), dtype=np.int64), \
+            np.zeros(0, dtype=np.int64)
+
+    anchors, indices = align_timestamps(timestamps, accept_interval)
+
+    return series, indices + np.array(offsets, dtype=np.int64), anchors
+
+
+def take_aligned(series, indices):
+    """ Stack the records of every exchange into (n, levels, 4) matrices. """
+
+    levels = [exchange_series.levels for exchange_series in series]
+    x = np.empty((len(indices), sum(levels), 4), dtype=np.float32)
+    row = 0
+
+    for i, exchange_series in enumerate(series):
+        x[:, row:(row + levels[i])] = exchange_series.take(indices[:, i])
+        row += levels[i]
+
+    return x
+
+
+def aligned_chunk_generator(database_dir, coin, accept_interval=120,
+                            chunk_size=1024, start=None, end=None):
+    """ Generate aligned samples of a coin from the column store in chunks.
+
+    Yields (n, levels, 4) float32 matrices with exchanges stacked as in
+    sample_generator, and their (n,) timestamps.
+    """
+
+    series, indices, anchors = align_columns(
+        database_dir, coin, accept_interval, start, end)
+
+    for chunk in range(0, len(anchors), chunk_size):
+        yield take_aligned(series, indices[chunk:(chunk + chunk_size)]), \
+            anchors[chunk:(chunk + chunk_size)]
+
+
+def aligned_sample_generator(database_dir, coin, accept_interval=120,
+                             chunk_size=1024, start=None, end=None):
+    """ Generate aligned samples one at a time, like sample_generator. """
+
+    for x, timestamps in aligned_chunk_generator(
+            database_dir, coin, accept_interval, chunk_size, start, end):
+        for i in range(len(timestamps)):
+            yield x[i], int(timestamps[i])
@@ -0,0 +1,155 @@
+import argparse
+from datetime import datetime
+from glob import glob
+import os
+import sqlite3
+
+from database.data_index import load_index
+from database.data_record import DataRecord
+
+CATALOG_NAME = "catalog.db"
+
+
+class DataCatalog:
+    """ Catalog of data files and the time range they cover.
+
+    The catalog is a SQLite database in <database_dir>/catalog.db with one
+    row per closed .tfrecords file.
+    """
+
+    def __init__(self, database_dir):
+        self.database_dir = database_dir
+        self.connection = sqlite3.connect(
+            os.path.join(database_dir, CATALOG_NAME), timeout=60,
+            check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, exchange TEXT, coin TEXT, "
+            "min_timestamp INTEGER, max_timestamp INTEGER, "
+            "records INTEGER, size INTEGER, levels INTEGER, mtime REAL)")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS files_range ON files "
+            "(exchange, coin, min_timestamp)")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def update_file(self, tfrecord_path, exchange, coin):
+        """ Add or refresh the entry of a closed file. """
+
+        index = load_index(tfrecord_path)
+        levels = 0
+
+        for data in DataRecord(tfrecord_path).read():
+            levels = len(data["ask_price"])
+            break
+
+        if len(index) > 0:
+            min_timestamp = int(index[:, 0].min())
+            max_timestamp = int(index[:, 0].max())
+        else:
+            min_timestamp = max_timestamp = None
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (os.path.relpath(tfrecord_path, self.database_dir), exchange,
+             coin, min_timestamp, max_timestamp, len(index),
+             os.path.getsize(tfrecord_path),
+             levels, os.path.getmtime(tfrecord_path)))
+        self.connection.commit()
+
+    def refresh(self, exchange="*", coin="*"):
+        """ Update entries of new or changed files and drop deleted ones.
+
+        The last file of each exchange/coin is still being written, so it
+        is not added.
+        """
+
+        entries = dict()
+        for path, size, mtime in self.connection.execute(
+                "SELECT path, size, mtime FROM files"):
+            entries[path] = (size, mtime)
+
+        found = set()
+        for coin_dir in glob(os.path.join(self.database_dir, exchange, coin)):
+            tfrecord_paths = sorted(
+                glob(os.path.join(coin_dir, '*.tfrecords')))
+            tfrecord_paths = tfrecord_paths[:(len(tfrecord_paths) - 1)]
+            coin_dir = os.path.relpath(coin_dir, self.database_dir)
+            pair = coin_dir.split(os.sep)
+
+            for tfrecord_path in tfrecord_paths:
+                path = os.path.relpath(tfrecord_path, self.database_dir)
+                found.add(path)
+                stat = (os.path.getsize(tfrecord_path),
+                        os.path.getmtime(tfrecord_path))
+
+                if entries.get(path) != stat:
+                    self.update_file(tfrecord_path, pair[0], pair[1])
+
+        for path in entries:
+            if path not in found and \
+                    not os.path.exists(os.path.join(self.database_dir, path)):
+                self.connection.execute(
+                    "DELETE FROM files WHERE path = ?", (path,))
+        self.connection.commit()
+
+    def get_files(self, exchange, coin, start=None, end=None):
+        """ Get files of an exchange/coin pair overlapping [start, end]. """
+
+        query = "SELECT path FROM files WHERE exchange = ? AND coin = ? " \
+                "AND records > 0"
+        params = [exchange, coin]
+
+        if start is not None:
+            query += " AND max_timestamp >= ?"
+            params.append(int(start))
+
+        if end is not None:
+            query += " AND min_timestamp <= ?"
+            params.append(int(end))
+
+        rows = self.connection.execute(query + " ORDER BY path", params)
+
+        return [os.path.join(self.database_dir, row[0]) for row in rows]
+
+    def get_summary(self):
+        """ Get files, records, bytes and time range per exchange/coin. """
+
+        rows = self.connection.execute(
+            "SELECT exchange, coin, COUNT(*), SUM(records), SUM(size), "
+            "MIN(min_timestamp), MAX(max_timestamp) FROM files "
+            "GROUP BY exchange, coin ORDER BY exchange, coin")
+
+        return rows.fetchall()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Summarize data catalog')
+    parser.add_argument('database_dir', type=str,
+                        help='directory where data is saved')
+    args = parser.parse_args()
+    database_dir = str(args.database_dir)
+
+    catalog = DataCatalog(database_dir)
+    catalog.refresh()
+
+    def time_str(timestamp):
+        if timestamp is None:
+            return "-"
+
+        return datetime.utcfromtimestamp(timestamp).strftime(
+            '%Y-%m-%d %H:%M:%S')
+
+    total_size = 0
+    for exchange, coin, files, records, size, min_time, max_time in \
+            catalog.get_summary():
+        total_size += size
+        print("[%s] %s - %d files, %d records, %.1f MB, %s to %s" % (
+            exchange, coin, files, records, size / 1e6,
+            time_str(min_time), time_str(max_time)))
+
+    print("Total: %.1f MB" % (total_size / 1e6))
+    catalog.close()
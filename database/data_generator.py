@@ -3,36 +3,230 @@ from datetime import datetime
 from glob import glob
 import os
 
+from database.aligned_cache import cached_sample_generator
 from database.config import EXCHANGE_DATA
+from database.data_catalog import DataCatalog
+from database.data_index import load_index, seek_offset
+from database.data_prefetch import prefetch_generator
 from database.data_record import DataRecord
+from database.tfrecord_reader import tfrecord_iterator
 import numpy as np
-import tensorflow as tf
 
+SEEK_MARGIN = 4 * 60 * 60  # in seconds.
+
+
+def get_data_paths(database_dir, exchange, coin, start=None, end=None,
+                   catalog=None):
+    """ Get the closed data files of an exchange and coin. """
+
+    if catalog is not None:
+        # Closed files overlapping the time range, without listing the tree.
+        return catalog.get_files(exchange, coin, start, end)
 
-def data_generator(database_dir, exchange, coin):
     database_dir = "%s/%s/%s/" % (database_dir, exchange, coin)
     tfrecord_paths = sorted(glob(os.path.join(database_dir, '*.tfrecords')))
-    tfrecord_paths = tfrecord_paths[:(len(tfrecord_paths) - 1)]
+
+    return tfrecord_paths[:(len(tfrecord_paths) - 1)]
+
+
+def data_generator(database_dir, exchange, coin, check_crc=False,
+                   start=None, end=None, catalog=None, cursor=None):
+    """ Generate the records of an exchange and coin.
+
+    When cursor is a dict, its "path" and "offset" are set to the position
+    after every record yielded, and reading starts from them when set.
+    """
+
+    tfrecord_paths = get_data_paths(database_dir, exchange, coin, start, end,
+                                    catalog)
+
+    if cursor is not None and "path" in cursor:
+        tfrecord_paths = [tfrecord_path for tfrecord_path in tfrecord_paths
+                          if tfrecord_path >= cursor["path"]]
 
     for tfrecord_path in tfrecord_paths:
         try:
+            offset = 0
+
+            if cursor is not None and tfrecord_path == cursor.get("path"):
+                offset = cursor["offset"]
+            elif start is not None or end is not None:
+                # Seek the first record in time range using the file index.
+                index = load_index(tfrecord_path)
+                if len(index) == 0 or \
+                        (start is not None and index[-1, 0] < start):
+                    continue
+
+                if end is not None and index[0, 0] > end:
+                    return
+
+                offset = seek_offset(index, start)
+
             data_record = DataRecord(tfrecord_path)
-            record_iterator = tf.python_io.tf_record_iterator(
-                path=tfrecord_path)
 
-            for string_record in record_iterator:
+            for string_record in tfrecord_iterator(tfrecord_path, check_crc,
+                                                   offset):
                 data = data_record.decode(string_record)
+                if end is not None and data["timestamp"] > end:
+                    return
+
+                # Records are framed by 16 bytes.
+                offset += len(string_record) + 16
+                if cursor is not None:
+                    cursor["path"], cursor["offset"] = (tfrecord_path, offset)
+
                 yield data
         except Exception:
             continue
 
 
-def sample_generator(database_dir, coin, accept_interval=120):
-    generators, exchange_data = (dict(), dict())
+def seek_samples(database_dir, coin, start, accept_interval=120, end=None,
+                 catalog=None, margin=SEEK_MARGIN):
+    """ Get the records of the first sample at or after start.
+
+    Replays the alignment of sample_generator on the timestamps of the file
+    indexes, without decoding records, from margin seconds before start.
+    Alignment depends on the records before, so the samples read from
+    there are the ones of a generator reading every record once both
+    resynchronize, which takes well under margin on regular data. Returns
+    a dict with the (path, offset) of the record of every exchange, or None
+    when there is no such sample.
+    """
+
+    exchanges = [exchange for exchange in EXCHANGE_DATA
+                 if coin in EXCHANGE_DATA[exchange]["coins"]]
+    first = start - margin
+    timestamps, paths, records = ([], [], [])
+
+    for exchange in exchanges:
+        exchange_paths, indexes = ([], [])
+
+        # Newest files first, back to the one holding the replay start.
+        for tfrecord_path in reversed(get_data_paths(
+                database_dir, exchange, coin, first, end, catalog)):
+            index = load_index(tfrecord_path)
+            if len(index) == 0:
+                continue
+
+            exchange_paths.append(tfrecord_path)
+            indexes.append(index)
+            if index[0, 0] < first:
+                break
+
+        exchange_paths.reverse()
+        indexes.reverse()
+        files = np.repeat(np.arange(len(indexes)),
+                          [len(index) for index in indexes])
+        index = np.concatenate(indexes) if len(indexes) > 0 else \
+            np.zeros((0, 2), dtype=np.int64)
+
+        # Records from the first one at or after the replay start, read
+        # until the first one after end.
+        lo = int(np.searchsorted(index[:, 0], first, side='left'))
+        hi = len(index) if end is None else \
+            int(np.searchsorted(index[:, 0], end, side='right'))
+
+        timestamps.append(index[lo:hi, 0])
+        paths.append(exchange_paths)
+        records.append(np.stack((files[lo:hi], index[lo:hi, 1]), axis=1))
+
+    if len(exchanges) == 0:
+        return None
+
+    positions = [-1] * len(exchanges)
+
+    try:
+        while True:
+            max_timestamp = 0
+            for i in range(len(exchanges)):
+                positions[i] += 1
+                max_timestamp = max(int(timestamps[i][positions[i]]),
+                                    max_timestamp)
+
+            sync = True
+            while sync:
+                sync = False
+
+                for i in range(len(exchanges)):
+                    while max_timestamp - timestamps[i][positions[i]] > \
+                            accept_interval:
+                        positions[i] += 1
+
+                    if timestamps[i][positions[i]] > max_timestamp:
+                        max_timestamp = int(timestamps[i][positions[i]])
+                        sync = True
+
+            if max_timestamp >= start:
+                break
+    except IndexError:
+        return None
+
+    first_records = dict()
+    for i, exchange in enumerate(exchanges):
+        file_number, offset = records[i][positions[i]]
+        first_records[exchange] = (paths[i][file_number], int(offset))
+
+    return first_records
+
+
+def sample_generator(database_dir, coin, accept_interval=120,
+                     check_crc=False, start=None, end=None, catalog=None,
+                     prefetch=None, cache=False, cursor=None):
+    """ Generate aligned samples of every exchange of a coin.
+
+    When cursor is a dict, it is updated with the position after every
+    sample yielded, a (path, offset) pair per exchange or the timestamp of
+    cached samples, and reading resumes from it when set. Prefetching
+    reads ahead, so it cannot keep a cursor.
+    """
+
+    if cache:
+        # Samples memory mapped from the cache of this generator.
+        if cursor is not None and "timestamp" in cursor:
+            start = cursor["timestamp"] + 1
+
+        for sample in cached_sample_generator(
+                database_dir, coin, accept_interval, start, end):
+            if cursor is not None:
+                cursor["timestamp"] = sample[1]
+
+            yield sample
+
+        return
+
+    if cursor is not None and prefetch is not None:
+        raise ValueError("Prefetched samples have no cursor.")
+
+    generators, exchange_data, positions = (dict(), dict(), dict())
+    first_records = dict()
+
+    if start is not None and (cursor is None or len(cursor) == 0):
+        # Samples at start may hold older records and depend on the ones
+        # before, so read from the records of the first sample.
+        first_records = seek_samples(database_dir, coin, start,
+                                     accept_interval, end, catalog)
+        if first_records is None:
+            return
 
     for exchange in EXCHANGE_DATA:
         if coin in EXCHANGE_DATA[exchange]["coins"]:
-            generators[exchange] = data_generator(database_dir, exchange, coin)
+            positions[exchange] = dict()
+            if cursor is not None and exchange in cursor:
+                positions[exchange]["path"], \
+                    positions[exchange]["offset"] = cursor[exchange]
+            elif exchange in first_records:
+                positions[exchange]["path"], \
+                    positions[exchange]["offset"] = first_records[exchange]
+
+            if prefetch is not None:
+                # Decode each exchange in a "thread" or "process" worker.
+                generators[exchange] = prefetch_generator(
+                    database_dir, exchange, coin, check_crc, None, end,
+                    catalog, prefetch, cursor=positions[exchange])
+            else:
+                generators[exchange] = data_generator(
+                    database_dir, exchange, coin, check_crc, None, end,
+                    catalog, positions[exchange])
 
     last_data = False
     while not last_data:
@@ -76,6 +270,12 @@ def sample_generator(database_dir, coin, accept_interval=120):
                      data["bid_price"], data["bid_qty"])).transpose()
                 x.append(x_exchange)
 
+            if cursor is not None:
+                for exchange in positions:
+                    if "path" in positions[exchange]:
+                        cursor[exchange] = (positions[exchange]["path"],
+                                            positions[exchange]["offset"])
+
             yield np.vstack(x), max_timestamp
         except StopIteration:
             last_data = True
@@ -89,10 +289,29 @@ if __name__ == "__main__":
     parser.add_argument('coin', type=str, nargs='?',
                         default="BTC",
                         help='coin used to read data')
+    parser.add_argument('--start', type=int, default=None,
+                        help='first timestamp to read')
+    parser.add_argument('--end', type=int, default=None,
+                        help='last timestamp to read')
+    parser.add_argument('--catalog', action='store_true',
+                        help='list files from the data catalog')
+    parser.add_argument('--prefetch', type=str, default=None,
+                        choices=['thread', 'process'],
+                        help='decode exchanges in background workers')
+    parser.add_argument('--cache', action='store_true',
+                        help='read aligned samples from the cache')
     args = parser.parse_args()
     database_dir = str(args.database_dir)
     coin = args.coin
-    generator = sample_generator(database_dir, coin)
+    catalog = None
+
+    if args.catalog:
+        catalog = DataCatalog(database_dir)
+        catalog.refresh()
+
+    generator = sample_generator(database_dir, coin, start=args.start,
+                                 end=args.end, catalog=catalog,
+                                 prefetch=args.prefetch, cache=args.cache)
 
     last_data = False
     while not last_data:
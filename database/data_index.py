@@ -0,0 +1,69 @@
+import os
+
+from database.tfrecord_reader import decode_example, tfrecord_iterator
+import numpy as np
+
+INDEX_EXTENSION = ".index.npy"
+
+
+def get_index_path(tfrecord_path):
+    return tfrecord_path + INDEX_EXTENSION
+
+
+def build_index(tfrecord_path):
+    """ Build (timestamp, byte offset) index of the records of a file. """
+
+    index, offset = ([], 0)
+
+    try:
+        for string_record in tfrecord_iterator(tfrecord_path):
+            features = decode_example(string_record)
+            index.append((features["timestamp"][0], offset))
+            offset += len(string_record) + 16
+    except IOError:
+        # Keep records before a truncated one.
+        pass
+
+    return np.array(index, dtype=np.int64).reshape(-1, 2)
+
+
+def write_index(tfrecord_path):
+    """ Build and save the index sidecar of a file. """
+
+    index = build_index(tfrecord_path)
+    index_path = get_index_path(tfrecord_path)
+
+    try:
+        with open(index_path + ".tmp", "wb") as index_file:
+            np.save(index_file, index)
+        os.replace(index_path + ".tmp", index_path)
+    except OSError:
+        pass
+
+    return index
+
+
+def load_index(tfrecord_path):
+    """ Load the index sidecar of a file, building it when missing or stale.
+    """
+
+    index_path = get_index_path(tfrecord_path)
+
+    if os.path.exists(index_path) and \
+            os.path.getmtime(index_path) >= os.path.getmtime(tfrecord_path):
+        return np.load(index_path)
+
+    return write_index(tfrecord_path)
+
+
+def seek_offset(index, start=None):
+    """ Get byte offset of the first record with timestamp >= start. """
+
+    if start is None or len(index) == 0:
+        return 0
+
+    i = int(np.searchsorted(index[:, 0], start, side='left'))
+    if i >= len(index):
+        return None
+
+    return int(index[i, 1])
@@ -0,0 +1,57 @@
+from database.config import EXCHANGE_DATA
+from database.data_alignment import get_exchanges
+import numpy as np
+
+
+class DataLayout:
+    """ Row layout of the stacked orderbooks of each coin.
+
+    Samples of a coin stack the levels of every exchange trading it, in
+    EXCHANGE_DATA order, as yielded by sample_generator.
+    """
+
+    def __init__(self, coins=()):
+        self.exchanges = dict()
+        self.limits = dict()
+        self.slices = dict()
+        self.tops = dict()
+        self.positions = dict()
+
+        for coin in coins:
+            self.add(coin)
+
+    def add(self, coin):
+        """ Compute the layout of a coin. """
+
+        if coin in self.exchanges:
+            return
+
+        exchanges = get_exchanges(coin)
+        limits = [EXCHANGE_DATA[exchange]["limit"] for exchange in exchanges]
+        tops = np.concatenate(([0], np.cumsum(limits)[:-1])).astype(np.int64)
+
+        self.exchanges[coin] = exchanges
+        self.limits[coin] = limits
+        self.tops[coin] = tops
+        for i, exchange in enumerate(exchanges):
+            self.slices[(coin, exchange)] = slice(
+                int(tops[i]), int(tops[i]) + limits[i])
+            self.positions[(coin, exchange)] = i
+
+    def get_slice(self, coin, exchange):
+        """ Get the rows of an exchange in the stacked orderbook of a coin.
+        """
+
+        return self.slices[(coin, exchange)]
+
+    def get_top(self, coin, exchange):
+        """ Get the row of the best level of an exchange. """
+
+        return self.slices[(coin, exchange)].start
+
+    def get_best(self, orderbook, coin):
+        """ Get best ask and bid prices of every exchange of a coin. """
+
+        tops = self.tops[coin]
+
+        return orderbook[tops, 0], orderbook[tops, 2]
@@ -0,0 +1,117 @@
+import multiprocessing
+import queue
+import threading
+
+from database.column_store import COLUMN_KEYS, pad_levels
+from database.config import EXCHANGE_DATA
+import numpy as np
+
+
+def _put(batch_queue, item, stop):
+    """ Put item in the queue unless the consumer stopped. """
+
+    while not stop.is_set():
+        try:
+            batch_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+
+    return False
+
+
+def _decode_batches(database_dir, exchange, coin, check_crc, start, end,
+                    catalog_dir, cursor, batch_size, batch_queue, stop):
+    """ Decode records into (timestamps, (n, levels, 4) matrix) batches. """
+
+    # Imported here to keep the worker independent from the consumer.
+    from database.data_catalog import DataCatalog
+    from database.data_generator import data_generator
+
+    catalog = None
+    if catalog_dir is not None:
+        catalog = DataCatalog(catalog_dir)
+
+    levels = EXCHANGE_DATA[exchange]["limit"]
+    timestamps = np.zeros(batch_size, dtype=np.int64)
+    batch = np.zeros((batch_size, levels, 4), dtype=np.float32)
+    size = 0
+
+    try:
+        for data in data_generator(database_dir, exchange, coin, check_crc,
+                                   start, end, catalog, cursor):
+            timestamps[size] = data["timestamp"]
+            for i, key in enumerate(COLUMN_KEYS[1:]):
+                batch[size, :, i] = pad_levels(data[key], levels)
+            size += 1
+
+            if size == batch_size:
+                if not _put(batch_queue, (timestamps, batch), stop):
+                    return
+
+                timestamps = np.zeros(batch_size, dtype=np.int64)
+                batch = np.zeros((batch_size, levels, 4), dtype=np.float32)
+                size = 0
+
+        if size > 0:
+            _put(batch_queue, (timestamps[:size], batch[:size]), stop)
+    finally:
+        _put(batch_queue, None, stop)
+
+        if catalog is not None:
+            catalog.close()
+
+
+def prefetch_generator(database_dir, exchange, coin, check_crc=False,
+                       start=None, end=None, catalog=None, workers="thread",
+                       batch_size=256, queue_size=4, cursor=None):
+    """ Decode records of an exchange/coin pair in a worker.
+
+    The worker ("thread" or "process") fills a bounded queue with NumPy
+    batches while records are consumed. Records are yielded as dicts of
+    views into the batches, with levels padded to the exchange limit.
+    Reading starts from the position of cursor, as in data_generator, but
+    the worker reads ahead, so cursor is not updated.
+    """
+
+    cursor = None if cursor is None else dict(cursor)
+
+    if workers == "process":
+        batch_queue = multiprocessing.Queue(queue_size)
+        stop = multiprocessing.Event()
+        worker_class = multiprocessing.Process
+    else:
+        batch_queue = queue.Queue(queue_size)
+        stop = threading.Event()
+        worker_class = threading.Thread
+
+    catalog_dir = None if catalog is None else catalog.database_dir
+    worker = worker_class(
+        target=_decode_batches,
+        args=[database_dir, exchange, coin, check_crc, start, end,
+              catalog_dir, cursor, batch_size, batch_queue, stop])
+    worker.daemon = True
+    worker.start()
+
+    try:
+        while True:
+            item = batch_queue.get()
+            if item is None:
+                break
+
+            timestamps, batch = item
+            for i in range(len(timestamps)):
+                data = dict()
+                data["timestamp"] = int(timestamps[i])
+                data["ask_price"] = batch[i, :, 0]
+                data["ask_qty"] = batch[i, :, 1]
+                data["bid_price"] = batch[i, :, 2]
+                data["bid_qty"] = batch[i, :, 3]
+                yield data
+    finally:
+        stop.set()
+        worker.join(1.0)
+
+        if workers == "process" and worker.is_alive():
+            # Unread batches may keep the queue feeder busy.
+            worker.terminate()
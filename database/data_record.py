@@ -1,18 +1,21 @@
+from database.tfrecord_reader import decode_example, tfrecord_iterator
 import numpy as np
-import tensorflow as tf
 
 
 def _int64_feature(value):
+    import tensorflow as tf
+
     return tf.train.Feature(int64_list=tf.train.Int64List(value=[value]))
 
 
 def _bytes_feature(value):
+    import tensorflow as tf
+
     return tf.train.Feature(bytes_list=tf.train.BytesList(value=[value]))
 
 
 def _float_list_feature(value):
-    data = _bytes_feature(
-        tf.compat.as_bytes(np.array(value, dtype=np.float32).tostring()))
+    data = _bytes_feature(np.array(value, dtype=np.float32).tobytes())
 
     return data
 
@@ -25,6 +28,9 @@ class DataRecord:
                      'bid_price', 'bid_qty']
 
     def open(self, tfrecord_path=""):
+        # TensorFlow is only needed to write records.
+        import tensorflow as tf
+
         if tfrecord_path != "":
             self.tfrecord_path = tfrecord_path
 
@@ -35,6 +41,8 @@ class DataRecord:
         self.writer.close()
 
     def write(self, data):
+        import tensorflow as tf
+
         example = tf.train.Example(
             features=tf.train.Features(
                 feature={
@@ -54,16 +62,20 @@ class DataRecord:
 
         self.writer.write(example.SerializeToString())
 
+    def read(self, check_crc=False, offset=0):
+        """ Iterate over the decoded records of the file. """
+
+        for string_record in tfrecord_iterator(self.tfrecord_path,
+                                               check_crc, offset):
+            yield self.decode(string_record)
+
     def decode(self, string_record):
-        example = tf.train.Example()
-        example.ParseFromString(string_record)
+        features = decode_example(string_record)
 
         data = dict()
         for key in self.keys[1:]:
-            data_string = (example.features.feature[key].bytes_list.value[0])
-            data[key] = np.fromstring(data_string, dtype=np.float32)
+            data[key] = np.frombuffer(features[key][0], dtype=np.float32)
 
-        data[self.keys[0]] = \
-            example.features.feature[self.keys[0]].int64_list.value[0]
+        data[self.keys[0]] = features[self.keys[0]][0]
 
         return data
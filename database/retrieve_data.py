@@ -5,6 +5,8 @@ import os
 import time
 
 from database.config import EXCHANGE_DATA
+from database.data_catalog import DataCatalog
+from database.data_index import write_index
 from database.data_record import DataRecord
 from exchange.client import ExchangeClient
 import numpy as np
@@ -20,6 +22,7 @@ def retrieve_data(database_dir, exchange, coin, limit=5000):
     REQUEST_INTERVAL = 60
 
     time_now = get_time()
+    database_root = database_dir
     database_dir = "%s/%s/%s/" % (database_dir, exchange, coin)
     if not os.path.exists(database_dir):
         os.makedirs(database_dir, exist_ok=True)
@@ -42,9 +45,14 @@ def retrieve_data(database_dir, exchange, coin, limit=5000):
             if current_day_index > day_index:
                 day_index = current_day_index
                 data_record.close()
+                closed_path = tfrecord_path
                 tfrecord_path = os.path.join(
                     database_dir, "%d.tfrecords" % time_now)
                 data_record.open(tfrecord_path)
+                write_index(closed_path)
+                catalog = DataCatalog(database_root)
+                catalog.update_file(closed_path, exchange, coin)
+                catalog.close()
 
             time_str = datetime.utcfromtimestamp(time_now).strftime(
                 '%Y-%m-%d %H:%M:%S')
@@ -0,0 +1,178 @@
+import struct
+
+import numpy as np
+
+
+def _crc32c_table():
+    table = []
+
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0x82F63B78
+            else:
+                crc >>= 1
+        table.append(crc)
+
+    return table
+
+
+_CRC32C_TABLE = _crc32c_table()
+
+
+def crc32c(data):
+    """ Compute CRC-32C (Castagnoli) checksum. """
+
+    crc = 0xFFFFFFFF
+    table = _CRC32C_TABLE
+
+    for byte in bytes(data):
+        crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+
+    return crc ^ 0xFFFFFFFF
+
+
+def masked_crc32c(data):
+    """ Compute the masked CRC-32C used by the TFRecord format. """
+
+    crc = crc32c(data)
+    return (((crc >> 15) | (crc << 17)) + 0xA282EAD8) & 0xFFFFFFFF
+
+
+def tfrecord_iterator(tfrecord_path, check_crc=False, offset=0):
+    """ Iterate over the records of a TFRecord file.
+
+    Each record is framed as uint64 length, uint32 masked CRC of length,
+    data and uint32 masked CRC of data, all little-endian.
+    """
+
+    with open(tfrecord_path, "rb") as tfrecord_file:
+        tfrecord_file.seek(offset)
+
+        while True:
+            header = tfrecord_file.read(12)
+            if len(header) == 0:
+                return
+
+            if len(header) < 12:
+                raise IOError("Truncated record in %s." % tfrecord_path)
+
+            length, length_crc = struct.unpack("<QI", header)
+            data = tfrecord_file.read(length)
+            footer = tfrecord_file.read(4)
+
+            if len(data) < length or len(footer) < 4:
+                raise IOError("Truncated record in %s." % tfrecord_path)
+
+            if check_crc:
+                data_crc = struct.unpack("<I", footer)[0]
+
+                if masked_crc32c(header[:8]) != length_crc or \
+                        masked_crc32c(data) != data_crc:
+                    raise IOError("Corrupted record in %s." % tfrecord_path)
+
+            yield data
+
+
+def _read_varint(data, pos):
+    result, shift = (0, 0)
+
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+
+        if byte < 0x80:
+            return result, pos
+
+        shift += 7
+
+
+def _read_fields(data, pos, end):
+    """ Iterate over (field number, wire type, value) of a message.
+
+    Length-delimited values are returned as a (start, end) tuple.
+    """
+
+    while pos < end:
+        key, pos = _read_varint(data, pos)
+        field, wire_type = (key >> 3, key & 0x7)
+
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            value = data[pos:pos + 8]
+            pos += 8
+        elif wire_type == 2:
+            length, pos = _read_varint(data, pos)
+            value = (pos, pos + length)
+            pos += length
+        elif wire_type == 5:
+            value = data[pos:pos + 4]
+            pos += 4
+        else:
+            raise ValueError("Unsupported wire type %d." % wire_type)
+
+        yield field, wire_type, value
+
+
+def _decode_int64(value):
+    if value >= 1 << 63:
+        value -= 1 << 64
+
+    return value
+
+
+def _decode_feature(data, start, end):
+    """ Decode a tf.train.Feature into a list of values. """
+
+    values = []
+
+    for field, _, (list_start, list_end) in _read_fields(data, start, end):
+        for _, wire_type, value in _read_fields(data, list_start, list_end):
+            if field == 1:
+                # BytesList.
+                values.append(data[value[0]:value[1]])
+            elif field == 2:
+                # FloatList.
+                if wire_type == 2:
+                    values.extend(np.frombuffer(
+                        data[value[0]:value[1]], dtype="<f4").tolist())
+                else:
+                    values.append(struct.unpack("<f", value)[0])
+            elif field == 3:
+                # Int64List.
+                if wire_type == 2:
+                    pos = value[0]
+                    while pos < value[1]:
+                        int_value, pos = _read_varint(data, pos)
+                        values.append(_decode_int64(int_value))
+                else:
+                    values.append(_decode_int64(value))
+
+    return values
+
+
+def decode_example(string_record):
+    """ Decode a serialized tf.train.Example into a feature dict.
+
+    Bytes values are returned as memoryviews of the record.
+    """
+
+    data = memoryview(string_record)
+    features = dict()
+
+    for _, _, (start, end) in _read_fields(data, 0, len(data)):
+        for _, _, (entry_start, entry_end) in _read_fields(data, start, end):
+            key, feature = (None, [])
+
+            for field, _, value in _read_fields(data, entry_start, entry_end):
+                if field == 1:
+                    key = bytes(data[value[0]:value[1]]).decode("utf-8")
+                elif field == 2:
+                    feature = _decode_feature(data, value[0], value[1])
+
+            features[key] = feature
+
+    return features
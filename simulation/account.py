@@ -0,0 +1,183 @@
+import heapq
+import random
+
+from simulation.order_store import CANCELLED, FILLED, OPEN, Order, \
+    OrderStore
+from simulation.portfolio import Portfolio, QUOTE_COIN
+# from simulation.logger import log
+
+DELAY_UNIT = 60  # in seconds.
+
+
+class SimulationAccount:
+    """ Balances and orders of one trader of a simulation exchange.
+
+    Market data comes from the exchange, so many accounts can trade on the
+    same data pass. fill_model is "limit" or "depth", see execute_order.
+    """
+
+    order_id = 0
+
+    def __init__(self, exchange, balance, trade_fee=0.005,
+                 max_delay_order=10, seed=None, fill_model="limit"):
+        self.exchange = exchange
+        self.balance = balance
+        self.portfolio = Portfolio(balance)
+        self.trade_fee = trade_fee
+        self.max_delay_order = max_delay_order
+        self.fill_model = fill_model
+        self.random = random.Random(seed)
+        self.orders = OrderStore()
+        self.fill_queue = []
+
+    def get_state(self):
+        """ Get balances, orders and the order delay generator state.
+
+        The state shares objects with the account, so save it right away.
+        """
+
+        state = dict()
+        state["portfolio"] = self.portfolio
+        state["orders"] = self.orders
+        state["fill_queue"] = self.fill_queue
+        state["order_id"] = self.order_id
+        state["random"] = self.random.getstate()
+
+        return state
+
+    def set_state(self, state):
+        """ Continue from a state of get_state. """
+
+        self.portfolio = state["portfolio"]
+        self.balance = self.portfolio.balance
+        self.orders = state["orders"]
+        self.fill_queue = state["fill_queue"]
+        self.order_id = state["order_id"]
+        self.random.setstate(state["random"])
+
+    def get_balance(self, coin):
+        """ Get balance. """
+
+        return self.balance[coin]
+
+    def send_order(self, from_coin, to_coin, price, amount, order_type):
+        """ Send order. """
+
+        if self.balance[from_coin] > 0:
+            if order_type == "buy":
+                self.portfolio.reserve(from_coin, amount)
+#                 data_time = self.exchange.get_timestamp()
+#                 log(data_time,
+#                       "Send order to buy %f %s (%f %s) by $%d" %
+#                       (amount / price, to_coin, amount, from_coin, price))
+            else:
+                self.portfolio.reserve(from_coin, amount)
+#                 data_time = self.exchange.get_timestamp()
+#                 log(data_time, "Send order to sell %f %s (%f %s) by $%d" %
+#                       (amount, from_coin, amount * price, to_coin, price))
+
+            fill_time = self.exchange.get_timestamp() + \
+                self.random.randint(1, self.max_delay_order) * DELAY_UNIT
+            order = Order(self.order_id, amount, price, from_coin, to_coin,
+                          order_type, fill_time)
+            self.order_id += 1
+            self.orders.add(order)
+            heapq.heappush(self.fill_queue, (order.fill_time, order.id))
+
+    def has_order(self):
+        """ Check if there is any open order. """
+
+        return len(self.orders) > 0
+
+    def get_balance_total(self, coin=QUOTE_COIN):
+        """ Get the value of balances and open orders in a coin.
+
+        Raises ValueError when a price is missing, see Portfolio.get_value.
+        """
+
+        prices = self.exchange.get_prices(self.portfolio.coins)
+
+        return self.portfolio.get_value(prices, coin)
+
+    def cancel_order(self, order_id):
+        """ Cancel an order. """
+
+        order = self.orders.get(order_id)
+
+        if order is not None and order.status == OPEN:
+            self.orders.set_status(order, CANCELLED)
+            self.portfolio.release(order.from_coin, order.amount)
+#             data_time = self.exchange.get_timestamp()
+
+#             if order.type == "buy":
+#                 log(data_time,
+#                       "Cancelled order to buy %f %s (%f %s) by $%d." %
+#                       (order.amount / order.price, order.to_coin
+#                        order.amount, order.from_coin,
+#                        order.price))
+#             else:
+#                 log(data_time,
+#                       "Cancelled order to sell %f %s (%f %s) by $%d" %
+#                       (order.amount, order.from_coin,
+#                        order.amount * order.price, order.to_coin
+#                        order.price))
+
+    def cancel_orders(self, coin, order_type):
+        """ Cancel orders. """
+
+        for order in self.orders.get_orders(coin, order_type):
+            self.cancel_order(order.id)
+
+    def execute_order(self):
+        """ Simulate execution of the orders due at the current time, in
+        fill time order.
+
+        The limit fill model fills whole orders at their price. The depth
+        fill model walks the current levels of the exchange up to the order
+        price, and the part of an order they cannot fill is retried at the
+        next minute.
+        """
+
+        time_now = self.exchange.get_timestamp()
+
+        while len(self.fill_queue) > 0 and self.fill_queue[0][0] <= time_now:
+            order = self.orders.get(heapq.heappop(self.fill_queue)[1])
+
+            if order is None or order.status != OPEN:
+                # Cancelled, and maybe dropped.
+                continue
+
+            if self.fill_model == "depth":
+                filled, received = self.exchange.get_fill(
+                    order.get_key()[0], order.type, order.amount,
+                    order.price)
+            elif order.type == "buy":
+                # log(time_now,
+                #     "Order to buy %f %s (%f %s) by $%d executed." %
+                #     (order.amount / order.price, order.to_coin,
+                #      order.amount, order.from_coin, order.price))
+
+                filled, received = (order.amount,
+                                    order.amount / order.price)
+            else:
+                # log(time_now,
+                #     "Order to sell %f %s (%f %s) by $%d executed." %
+                #     (order.amount, order.from_coin,
+                #      order.amount * order.price, order.to_coin,
+                #      order.price))
+
+                filled, received = (order.amount,
+                                    order.amount * order.price)
+
+            self.portfolio.settle(order.from_coin, filled, order.to_coin,
+                                  received * (1.0 - self.trade_fee))
+
+            order.filled += filled
+
+            if filled < order.amount:
+                # The residual waits for the next book.
+                order.amount -= filled
+                order.fill_time = time_now + DELAY_UNIT
+                heapq.heappush(self.fill_queue, (order.fill_time, order.id))
+            else:
+                self.orders.set_status(order, FILLED)
@@ -0,0 +1,24 @@
+'''
+Save and load simulation checkpoints.
+'''
+
+import os
+import pickle
+
+
+def save_checkpoint(checkpoint_path, state):
+    """ Save a state, replacing the checkpoint file at once. """
+
+    tmp_path = checkpoint_path + ".tmp"
+
+    with open(tmp_path, "wb") as checkpoint_file:
+        pickle.dump(state, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.replace(tmp_path, checkpoint_path)
+
+
+def load_checkpoint(checkpoint_path):
+    """ Load the state of a checkpoint file. """
+
+    with open(checkpoint_path, "rb") as checkpoint_file:
+        return pickle.load(checkpoint_file)
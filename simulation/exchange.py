@@ -1,153 +1,196 @@
-import random
 import numpy as np
 
 from database.config import EXCHANGE_DATA
 from database.data_generator import sample_generator
-# from simulation.logger import log
+from database.data_layout import DataLayout
+from simulation.account import SimulationAccount
+from simulation.orderbook import join_orderbook, MergedBook, walk_levels
+from simulation.portfolio import QUOTE_COIN
+
+ACCEPT_INTERVAL = 120  # in seconds.
 
 
 class SimulationExchange:
-    orders = []
-    delay_order = 0
-    order_id = 0
-    generators = dict()
-    last_data = dict()
     timestamp = 0
 
     def __init__(self, balance, trade_fee=0.005, max_delay_order=10,
-                 database_dir="resources", exchange="binance"):
-        self.max_delay_order = max_delay_order
-        self.balance = balance
-        self.trade_fee = trade_fee
+                 database_dir="resources", exchange="binance", cache=False,
+                 coins=None, start=None, end=None, seed=None,
+                 fill_model="limit", prefetch=None):
+        self.account = SimulationAccount(self, balance, trade_fee,
+                                         max_delay_order, seed, fill_model)
+        self.accounts = [self.account]
         self.database_dir = database_dir
         self.exchange = exchange
-
-        coins = []
-        for exchange in EXCHANGE_DATA:
-            coins.extend(EXCHANGE_DATA[exchange]["coins"])
+        self.cache = cache
+        self.prefetch = prefetch
+        self.end = end
+        self.generators = dict()
+        self.cursors = dict()
+        self.last_data = dict()
+        self.merged_books = dict()
+        self.prices = dict()
+
+        if coins is None:
+            # Subscribe every coin of every exchange.
+            coins = []
+            for exchange in EXCHANGE_DATA:
+                coins.extend(EXCHANGE_DATA[exchange]["coins"])
         self.coins = set(coins)
+        self.layout = DataLayout(self.coins)
 
         for coin in self.coins:
-            self.generators[coin] = sample_generator(database_dir, coin)
+            self.cursors[coin] = dict()
+            self.generators[coin] = self._get_generator(coin, start)
 
-        for coin in EXCHANGE_DATA["binance"]["coins"]:
-            self.last_data[coin] = [[]]
         self.increment_time()
 
-    def get_orderbook(self, coin="BTC", delta_join=0.0005, size=30):
-        limit_inferior = 0
+    def _get_generator(self, coin, start=None):
+        """ Get the sample generator of a coin.
+
+        Prefetched samples are decoded in background workers, which read
+        ahead, so their position is not kept and the state cannot be saved.
+        """
+
+        if self.prefetch is not None and not self.cache:
+            return sample_generator(
+                self.database_dir, coin, start=start, end=self.end,
+                prefetch=self.prefetch)
+
+        return sample_generator(
+            self.database_dir, coin, start=start, end=self.end,
+            cache=self.cache, cursor=self.cursors[coin])
+
+    def subscribe(self, coin):
+        """ Subscribe coin data, synchronized with the current time. """
+
+        if coin in self.coins:
+            return
 
-        for exchange in EXCHANGE_DATA:
-            if exchange != self.exchange:
-                if coin in EXCHANGE_DATA[exchange]["coins"]:
-                    limit_inferior += EXCHANGE_DATA[exchange]["limit"]
-            else:
-                break
+        self.cursors[coin] = dict()
+        generator = self._get_generator(coin,
+                                        self.timestamp - ACCEPT_INTERVAL)
+        self.last_data[coin] = next(generator)
+        self.generators[coin] = generator
+        self.layout.add(coin)
+        self.coins.add(coin)
+        self.prices = dict()
+        self._save_positions()
 
-        limit_superior = limit_inferior + EXCHANGE_DATA[self.exchange]["limit"]
+    def get_subscriptions(self):
+        """ Get subscribed coins. """
+
+        return sorted(self.coins)
+
+    def get_orderbook(self, coin="BTC", delta_join=0.0005, size=30):
         orderbook = self.last_data[coin][0]
-        orderbook = orderbook[limit_inferior:limit_superior]
+        orderbook = orderbook[self.layout.get_slice(coin, self.exchange)]
         orderbook_ask = orderbook[:, :2]
         orderbook_bid = orderbook[:, 2:]
-        orderbook = np.zeros((size, 4))
-
-        for data, p, q in zip([orderbook_ask, orderbook_bid], [0, 2], [1, 3]):
-            i, j, k, price_qty, qty = (0, 0, 0, 0, 0.0000000001)
-
-            while i < len(data) - 1 and k < size:
-                if np.abs(data[i][0] - data[j][0]) / \
-                        data[j][0] > delta_join:
-                    orderbook[k, p] = price_qty / qty
-                    orderbook[k, q] = qty
-                    k += 1
-                    j = i + 1
-                    qty = 0.0000000001
-                    price_qty = 0
-                else:
-                    price_qty += data[i][0] * data[i][1]
-                    qty += data[i][1]
-
-                i += 1
-
-            i = k
-            k = k - 1
-            while i < size:
-                orderbook[i, p] = orderbook[k, p]
-                orderbook[i, q] = orderbook[k, q]
-                i += 1
+        orderbook = join_orderbook(orderbook_ask, orderbook_bid, delta_join,
+                                   size)
 
         return orderbook
 
+    def get_orderbook_levels(self, coin="BTC"):
+        """ Get the unjoined (limit, 4) levels of the exchange of a coin. """
+
+        return self.last_data[coin][0][self.layout.get_slice(coin,
+                                                             self.exchange)]
+
+    def get_fill(self, coin, order_type, amount, price=None):
+        """ Fill an order walking the current levels of a coin.
+
+        Buy orders spend a base coin amount on the asks and sell orders sell
+        a coin amount on the bids, at their limit price or better if set.
+        Returns the filled part of amount and the amount received for it,
+        before fees.
+        """
+
+        orderbook = self.get_orderbook_levels(coin)
+
+        if order_type == "buy":
+            return walk_levels(orderbook[:, :2], amount, quote=True,
+                               limit=price)
+
+        return walk_levels(orderbook[:, 2:], amount, limit=price)
+
+    def get_merged_book(self, coin="BTC"):
+        """ Get the current consolidated book of all exchanges of a coin.
+        """
+
+        if coin not in self.merged_books:
+            self.merged_books[coin] = MergedBook(self.layout.limits[coin])
+
+        merged_book = self.merged_books[coin]
+        if merged_book.data is not self.last_data[coin][0]:
+            merged_book.merge(self.last_data[coin][0])
+
+        return merged_book
+
     def get_orderbook_join(self, coin="BTC", delta_join=0.0005, size=30):
-        orderbook = self.last_data[coin][0] + 0.0000000001
-        orderbook_ask = np.sort(orderbook[:, :2], axis=0)
-        orderbook_bid = np.sort(orderbook[:, 2:], axis=0)[::-1]
-        orderbook = np.zeros((size, 4))
-
-        for data, p, q in zip([orderbook_ask, orderbook_bid], [0, 2], [1, 3]):
-            i, j, k, price_qty, qty = (0, 0, 0, 0, 0.0000000001)
-
-            while i < len(data) - 1 and k < size:
-                if np.abs(data[i][0] - data[j][0]) / \
-                        data[j][0] > delta_join:
-                    orderbook[k, p] = price_qty / qty
-                    orderbook[k, q] = qty
-                    k += 1
-                    j = i + 1
-                    qty = 0.0000000001
-                    price_qty = 0
-                else:
-                    price_qty += data[i][0] * data[i][1]
-                    qty += data[i][1]
-
-                i += 1
-
-            i = k
-            k = k - 1
-            while i < size:
-                orderbook[i, p] = orderbook[k, p]
-                orderbook[i, q] = orderbook[k, q]
-                i += 1
+        merged_book = self.get_merged_book(coin)
+        orderbook = join_orderbook(merged_book.ask, merged_book.bid,
+                                   delta_join, size)
 
         return orderbook
 
-    def get_ticker(self, coin="BTC"):
-        limit_inferior = 0
+    def get_orderbook_depth(self, coin="BTC", price=0, side="bid"):
+        """ Get quantity per exchange at prices as good as price. """
+
+        depth = self.get_merged_book(coin).get_depth(price, side)
 
-        for exchange in EXCHANGE_DATA:
-            if exchange != self.exchange:
-                if coin in EXCHANGE_DATA[exchange]["coins"]:
-                    limit_inferior += EXCHANGE_DATA[exchange]["limit"]
-            else:
-                break
+        return dict(zip(self.layout.exchanges[coin], depth))
 
+    def get_ticker(self, coin="BTC"):
         orderbook = self.last_data[coin][0]
-        ticker = orderbook[limit_inferior][2]
+        ticker = orderbook[self.layout.get_top(coin, self.exchange), 2]
 
         return ticker
 
     def get_ticker_join(self, coin="BTC"):
-        tickers = []
-        limit_inferior = 0
-
-        for exchange in EXCHANGE_DATA:
-            if coin in EXCHANGE_DATA[exchange]["coins"]:
-                orderbook = self.last_data[coin][0]
-                ticker = orderbook[limit_inferior][2]
-                limit_inferior += EXCHANGE_DATA[exchange]["limit"]
-                tickers.append(ticker)
+        tickers = self.layout.get_best(self.last_data[coin][0], coin)[1]
 
         # tickers = np.sort(tickers)[:4]
         ticker = np.mean(tickers)
         return ticker
 
+    def get_prices(self, coins):
+        """ Get the current price vector of coins in the quote coin.
+
+        Coins without data have no price. Vectors are cached until time
+        changes.
+        """
+
+        key = tuple(coins)
+
+        if key not in self.prices:
+            prices = np.full(len(coins), np.nan)
+
+            for i, coin in enumerate(coins):
+                if coin == QUOTE_COIN:
+                    prices[i] = 1
+                elif coin in self.coins:
+                    prices[i] = self.get_ticker(coin)
+
+            self.prices[key] = prices
+
+        return self.prices[key]
+
+    def get_best_prices(self, coin="BTC"):
+        """ Get best ask and bid prices of every exchange of a coin. """
+
+        asks, bids = self.layout.get_best(self.last_data[coin][0], coin)
+
+        return self.layout.exchanges[coin], asks, bids
+
     def get_coins(self):
         return EXCHANGE_DATA[self.exchange]["coins"]
 
     def get_balance(self, coin):
         """ Get balance. """
 
-        return self.balance[coin]
+        return self.account.get_balance(coin)
 
     def increment_time(self):
         """ Increment simulation time. """
@@ -165,7 +208,7 @@ class SimulationExchange:
             for coin in self.coins:
                 delta = max_timestamp - self.last_data[coin][1]
 
-                while delta > 120:
+                while delta > ACCEPT_INTERVAL:
                     self.last_data[coin] = next(self.generators[coin])
                     delta = max_timestamp - self.last_data[coin][1]
 
@@ -174,132 +217,112 @@ class SimulationExchange:
                     sync = True
 
         self.timestamp = max_timestamp
+        self.prices = dict()
+        self._save_positions()
+
+    def _save_positions(self):
+        """ Keep the data and cursors of the current time, since a failed
+        increment_time may advance some generators.
+        """
+
+        self.positions = dict()
+        self.positions["timestamp"] = self.timestamp
+        self.positions["last_data"] = dict(self.last_data)
+        self.positions["cursors"] = dict(
+            [(coin, dict(self.cursors[coin])) for coin in self.coins])
+
+    def get_state(self):
+        """ Get the data positions and account states at the current time.
+        """
+
+        if self.prefetch is not None and not self.cache:
+            raise ValueError("Prefetched samples have no cursor.")
+
+        state = dict(self.positions)
+        state["accounts"] = [account.get_state() for account in self.accounts]
+
+        return state
+
+    def set_state(self, state):
+        """ Continue from a state of get_state, reading data from its
+        cursors. Accounts are restored in place, in order.
+        """
+
+        if len(state["accounts"]) != len(self.accounts):
+            raise ValueError("State has %d accounts, exchange has %d." %
+                             (len(state["accounts"]), len(self.accounts)))
+
+        self.coins = set(state["cursors"])
+        self.layout = DataLayout(self.coins)
+        self.generators, self.cursors = (dict(), dict())
+
+        if self.prefetch is not None and not self.cache:
+            raise ValueError("Prefetched samples have no cursor.")
+
+        for coin in self.coins:
+            self.cursors[coin] = dict(state["cursors"][coin])
+            self.generators[coin] = self._get_generator(coin)
+
+        self.last_data = dict(state["last_data"])
+        self.timestamp = state["timestamp"]
+        self.merged_books = dict()
+        self.prices = dict()
+        self._save_positions()
+
+        for account, account_state in zip(self.accounts, state["accounts"]):
+            account.set_state(account_state)
 
     def get_timestamp(self):
         return self.timestamp
 
+    def add_account(self, balance, trade_fee=None, max_delay_order=None,
+                    seed=None, fill_model=None):
+        """ Add an account trading on the same market data. """
+
+        if trade_fee is None:
+            trade_fee = self.account.trade_fee
+        if max_delay_order is None:
+            max_delay_order = self.account.max_delay_order
+        if fill_model is None:
+            fill_model = self.account.fill_model
+
+        account = SimulationAccount(self, balance, trade_fee,
+                                    max_delay_order, seed, fill_model)
+        self.accounts.append(account)
+
+        return account
+
+    def get_accounts(self):
+        """ Get accounts, the default one first. """
+
+        return list(self.accounts)
+
     def send_order(self, from_coin, to_coin, price, amount, order_type):
         """ Send order. """
 
-        if self.balance[from_coin] > 0:
-            if order_type == "buy":
-                self.balance[from_coin] -= amount
-#                 data_time = self.get_timestamp()
-#                 log(data_time,
-#                       "Send order to buy %f %s (%f %s) by $%d" %
-#                       (amount / price, to_coin, amount, from_coin, price))
-            else:
-                self.balance[from_coin] -= amount
-#                 data_time = self.get_timestamp()
-#                 log(data_time, "Send order to sell %f %s (%f %s) by $%d" %
-#                       (amount, from_coin, amount * price, to_coin, price))
-
-            order = dict()
-            order["id"] = self.order_id
-            order["amount"] = amount
-            order["price"] = price
-            order["from_coin"] = from_coin
-            order["to_coin"] = to_coin
-            order["type"] = order_type
-            self.order_id += 1
-            self.orders.append(order)
+        self.account.send_order(from_coin, to_coin, price, amount, order_type)
 
     def has_order(self):
         """ Check if there is any order. """
 
-        return len(self.orders) > 0
+        return self.account.has_order()
 
-    def get_balance_total(self, coin="USDT"):
-        """ Check if there is any order. """
+    def get_balance_total(self, coin=QUOTE_COIN):
+        """ Get total balance of the default account. """
 
-        if coin == "USDT":
-            amount = self.balance["USDT"]
-            amount += self.balance["BTC"] * self.get_ticker()
-
-            for order in self.orders:
-                if order["from_coin"] == "USDT":
-                    amount += order["amount"]
-                else:
-                    amount += order["amount"] * self.get_ticker()
-        elif coin == "BTC":
-            amount = self.balance["BTC"]
-            amount += self.balance["USDT"] / self.get_ticker()
-
-            for order in self.orders:
-                if order["from_coin"] == "BTC":
-                    amount += order["amount"]
-                else:
-                    amount += order["amount"] / self.get_ticker()
-        else:
-            amount = 0
-
-        return amount
+        return self.account.get_balance_total(coin)
 
     def cancel_order(self, order_id):
         """ Cancel an order. """
 
-        tmp_orders = []
-
-        for order in self.orders:
-            if order["id"] != order_id:
-                tmp_orders.append(order)
-            else:
-                self.balance[order["from_coin"]] += order["amount"]
-#                 data_time = self.get_timestamp()
-
-#                 if order["type"] == "buy":
-#                     log(data_time,
-#                           "Cancelled order to buy %f %s (%f %s) by $%d." %
-#                           (order["amount"] / order["price"], order["to_coin"]
-#                            order["amount"], order["from_coin"],
-#                            order["price"]))
-#                 else:
-#                     log(data_time,
-#                           "Cancelled order to sell %f %s (%f %s) by $%d" %
-#                           (order["amount"], order["from_coin"],
-#                            order["amount"] * order["price"], order["to_coin"]
-#                            order["price"]))
-
-        self.orders = tmp_orders
+        self.account.cancel_order(order_id)
 
     def cancel_orders(self, coin, order_type):
         """ Cancel orders. """
 
-        orders = list(self.orders)
-
-        for order in orders:
-            if (order["type"] == order_type) and \
-               ((order["to_coin"] == coin and order["type"] == "buy") or
-                    (order["from_coin"] == coin and order["type"] == "sell")):
-                self.cancel_order(order["id"])
+        self.account.cancel_orders(coin, order_type)
 
     def execute_order(self):
         """ Simulate order execution. """
 
-        if self.delay_order <= 0:
-            order = self.orders.pop()
-
-            if order["type"] == "buy":
-                # data_time = self.get_timestamp()
-                # log(data_time,
-                #     "Order to buy %f %s (%f %s) by $%d executed." %
-                #     (order["amount"] / order["price"], order["to_coin"],
-                #      order["amount"], order["from_coin"], order["price"]))
-
-                self.balance[order["to_coin"]] += \
-                    order["amount"] / order["price"] * (1.0 - self.trade_fee)
-            else:
-                # data_time = self.get_timestamp()
-                # log(data_time,
-                #     "Order to sell %f %s (%f %s) by $%d executed." %
-                #     (order["amount"], order["from_coin"],
-                #      order["amount"] * order["price"], order["to_coin"],
-                #      order["price"]))
-
-                self.balance[order["to_coin"]] += \
-                    order["amount"] * order["price"] * (1.0 - self.trade_fee)
-
-            # Generate next delay.
-            self.delay_order = random.randint(1, self.max_delay_order)
-        else:
-            self.delay_order -= 1
+        self.account.execute_order()
@@ -0,0 +1,112 @@
+'''
+Indexed storage of simulated orders.
+'''
+
+OPEN = "open"
+FILLED = "filled"
+CANCELLED = "cancelled"
+MAX_CLOSED_ORDERS = 1000  # filled or cancelled orders kept.
+
+
+class Order:
+    """ Order record. """
+
+    __slots__ = ["id", "amount", "filled", "price", "from_coin", "to_coin",
+                 "type", "fill_time", "status"]
+
+    def __init__(self, order_id, amount, price, from_coin, to_coin,
+                 order_type, fill_time=0):
+        self.id = order_id
+        self.amount = amount
+        self.filled = 0
+        self.price = price
+        self.from_coin = from_coin
+        self.to_coin = to_coin
+        self.type = order_type
+        self.fill_time = fill_time
+        self.status = OPEN
+
+    def get_key(self):
+        """ Get the (coin, type) key of the order, where the coin is the one
+        bought or sold.
+        """
+
+        if self.type == "buy":
+            return self.to_coin, self.type
+
+        return self.from_coin, self.type
+
+
+class OrderStore:
+    """ Orders indexed by id, by (coin, type) and by status.
+
+    Only open orders are indexed by (coin, type). Lookups by id are O(1)
+    and by key or status O(k) in the k orders found.
+
+    Only the last max_closed filled or cancelled orders are kept, older
+    ones are dropped, unless max_closed is None.
+    """
+
+    def __init__(self, max_closed=MAX_CLOSED_ORDERS):
+        self.orders = dict()
+        self.keys = dict()
+        self.statuses = dict([(status, dict())
+                              for status in [OPEN, FILLED, CANCELLED]])
+        self.max_closed = max_closed
+        self.closed = dict()  # in closing order.
+
+    def __len__(self):
+        """ Get the number of open orders. """
+
+        return len(self.statuses[OPEN])
+
+    def add(self, order):
+        """ Add an open order. """
+
+        self.orders[order.id] = order
+        self.keys.setdefault(order.get_key(), dict())[order.id] = order
+        self.statuses[order.status][order.id] = order
+
+    def get(self, order_id):
+        """ Get an order by id, or None. """
+
+        return self.orders.get(order_id)
+
+    def get_orders(self, coin=None, order_type=None, status=OPEN):
+        """ Get orders with a status, of a coin and type when set. """
+
+        if coin is not None and order_type is not None and status == OPEN:
+            return list(self.keys.get((coin, order_type), dict()).values())
+
+        orders = self.statuses[status].values()
+
+        return [order for order in orders
+                if (coin is None or order.get_key()[0] == coin) and
+                (order_type is None or order.type == order_type)]
+
+    def set_status(self, order, status):
+        """ Move an order to another status. """
+
+        del self.statuses[order.status][order.id]
+        if order.status == OPEN:
+            del self.keys[order.get_key()][order.id]
+        else:
+            del self.closed[order.id]
+
+        order.status = status
+        self.statuses[status][order.id] = order
+        if status == OPEN:
+            self.keys.setdefault(order.get_key(), dict())[order.id] = order
+        else:
+            self.closed[order.id] = order
+
+        if self.max_closed is not None:
+            while len(self.closed) > self.max_closed:
+                self.remove(next(iter(self.closed.values())))
+
+    def remove(self, order):
+        """ Drop a filled or cancelled order. """
+
+        del self.closed[order.id]
+        del self.statuses[order.status][order.id]
+        del self.orders[order.id]
@@ -0,0 +1,354 @@
+'''
+Vectorized orderbook operations.
+'''
+
+import numpy as np
+
+QTY_EPSILON = 0.0000000001
+BATCH_SIZE = 32
+MATRIX_LEVELS = 64  # compare all levels of shorter books.
+
+_upper_masks = dict()
+
+
+def _get_upper_mask(levels):
+    """ Get the (levels, levels - 1) mask of levels i >= j of each row j.
+    """
+
+    if levels not in _upper_masks:
+        _upper_masks[levels] = np.arange(levels - 1)[None, :] >= \
+            np.arange(levels)[:, None]
+
+    return _upper_masks[levels]
+
+
+def _break_matrix(price, delta_join):
+    """ Get first break level of every group start comparing all levels. """
+
+    levels = price.shape[1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        breaks = np.abs(price[:, None, :(levels - 1)] -
+                        price[:, :, None]) / price[:, :, None] > delta_join
+
+    breaks &= _get_upper_mask(levels)[None]
+
+    return breaks.any(axis=2), np.argmax(breaks, axis=2)
+
+
+def _break_sorted(price, delta_join):
+    """ Get first break level of every group start of sorted prices.
+
+    Candidates come from a binary search and are checked with the exact
+    relative distance. Returns None when the prices are not sorted and
+    positive or a candidate is off.
+    """
+
+    levels = len(price)
+    if not np.all(price > 0):
+        return None
+
+    change = np.diff(price)
+    if np.all(change >= 0):
+        key = price
+    elif np.all(change <= 0):
+        key = -price
+    else:
+        return None
+
+    start = np.arange(levels)
+    group_end = np.searchsorted(key, key + price * delta_join, side='right')
+    group_end = np.clip(group_end, start, levels - 1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        is_break = np.abs(price[group_end] - price) / price > delta_join
+        previous = np.maximum(group_end - 1, 0)
+        previous_break = np.abs(price[previous] - price) / price > delta_join
+
+    found = group_end < levels - 1
+    if np.any(found & ~is_break) or \
+            np.any((previous >= start) & (group_end > start) &
+                   previous_break):
+        return None
+
+    return found, group_end
+
+
+def _join_group_bounds(price, delta_join, size):
+    """ Get [start, end) of the joined groups of each row of prices.
+
+    A group starts at level j and ends at the first level i >= j whose
+    price is farther than delta_join (relative) from the price at j. The
+    level i is skipped and the next group starts at i + 1. The last level
+    never ends a group, so an unfinished last group is dropped.
+    """
+
+    batch, levels = price.shape
+
+    if levels <= MATRIX_LEVELS:
+        found, group_end = _break_matrix(price, delta_join)
+    else:
+        found = np.zeros((batch, levels), dtype=bool)
+        group_end = np.zeros((batch, levels), dtype=np.int64)
+        unsorted = []
+
+        for row in range(batch):
+            bounds = _break_sorted(price[row], delta_join)
+
+            if bounds is None:
+                unsorted.append(row)
+            else:
+                found[row], group_end[row] = bounds
+
+        if len(unsorted) > 0:
+            found[unsorted], group_end[unsorted] = _break_matrix(
+                price[unsorted], delta_join)
+
+    starts = np.zeros((batch, size), dtype=np.int64)
+    ends = np.zeros((batch, size), dtype=np.int64)
+    count = np.zeros(batch, dtype=np.int64)
+
+    # Groups chain from the end of the previous one, at most size steps.
+    for row, (row_found, row_end) in enumerate(zip(found.tolist(),
+                                                   group_end.tolist())):
+        start, k = (0, 0)
+
+        while k < size and row_found[start]:
+            starts[row, k] = start
+            ends[row, k] = row_end[start]
+            start = row_end[start] + 1
+            k += 1
+
+        count[row] = k
+
+    return starts, ends, count
+
+
+def _join_levels(data, delta_join, size):
+    batch, levels = data.shape[:2]
+    result = np.zeros((batch, size, 2))
+
+    if levels < 2:
+        return result
+
+    starts, ends, count = _join_group_bounds(data[:, :, 0], delta_join, size)
+    valid = np.arange(size)[None, :] < count[:, None]
+    valid_rows, valid_groups = np.nonzero(valid)
+
+    if len(valid_rows) > 0:
+        price_qty = (data[:, :, 0].astype(np.float64) * data[:, :, 1]).ravel()
+        qty = data[:, :, 1].astype(np.float64).ravel()
+        bounds = np.empty(2 * len(valid_rows), dtype=np.int64)
+        bounds[0::2] = valid_rows * levels + starts[valid]
+        bounds[1::2] = valid_rows * levels + ends[valid]
+
+        group_qty = np.add.reduceat(qty, bounds)[0::2] + QTY_EPSILON
+        group_price_qty = np.add.reduceat(price_qty, bounds)[0::2]
+        result[valid_rows, valid_groups, 0] = group_price_qty / group_qty
+        result[valid_rows, valid_groups, 1] = group_qty
+
+    # Missing groups repeat the last joined one, or stay zero without any.
+    last = np.minimum(np.arange(size)[None, :], count[:, None] - 1)
+    last = np.maximum(last, 0)
+    result = result[np.arange(batch)[:, None], last]
+    result[count == 0] = 0
+
+    return result
+
+
+def _join_row(data, delta_join, size):
+    """ Join the (levels, 2) levels of one book, as _join_levels.
+
+    Books are joined on every tick, where the fixed cost of each NumPy call
+    outweighs the work, so this path keeps the calls few.
+    """
+
+    levels = len(data)
+    result = np.zeros((size, 2))
+
+    if levels < 2:
+        return result
+
+    price = data[:, 0]
+    group_bounds = None
+
+    if levels > MATRIX_LEVELS:
+        group_bounds = _break_sorted(price, delta_join)
+
+    if group_bounds is None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            breaks = np.abs(price[:-1] - price[:, None]) / price[:, None] > \
+                delta_join
+        breaks &= _get_upper_mask(levels)
+        group_bounds = (breaks.any(axis=1), np.argmax(breaks, axis=1))
+
+    found, group_end = (group_bounds[0].tolist(), group_bounds[1].tolist())
+
+    # Groups chain from the end of the previous one, at most size steps.
+    bounds, start = ([], 0)
+    while len(bounds) < 2 * size and found[start]:
+        bounds.append(start)
+        bounds.append(group_end[start])
+        start = group_end[start] + 1
+
+    count = len(bounds) // 2
+    if count == 0:
+        return result
+
+    values = data.astype(np.float64)
+    values[:, 0] *= data[:, 1]
+    sums = np.add.reduceat(values, bounds, axis=0)[0::2]
+    result[:count, 1] = sums[:, 1] + QTY_EPSILON
+    result[:count, 0] = sums[:, 0] / result[:count, 1]
+
+    # Missing groups repeat the last joined one.
+    result[count:] = result[count - 1]
+
+    return result
+
+
+def join_levels(data, delta_join=0.0005, size=30):
+    """ Join close price levels into quantity weighted levels.
+
+    data has shape (..., levels, 2) with price and quantity columns, sorted
+    from the best level. Returns (..., size, 2) joined levels, same as the
+    original per level loop of SimulationExchange.get_orderbook.
+    """
+
+    data = np.asarray(data)
+    if data.ndim == 2:
+        return _join_row(data, delta_join, size)
+
+    batch_shape, levels = (data.shape[:-2], data.shape[-2])
+    data = data.reshape((int(np.prod(batch_shape)), levels, 2))
+    result = np.zeros((len(data), size, 2))
+
+    for i in range(0, len(data), BATCH_SIZE):
+        result[i:(i + BATCH_SIZE)] = _join_levels(
+            data[i:(i + BATCH_SIZE)], delta_join, size)
+
+    return result.reshape(batch_shape + (size, 2))
+
+
+def join_orderbook(orderbook_ask, orderbook_bid, delta_join=0.0005, size=30):
+    """ Join ask and bid levels into (..., size, 4) orderbooks. """
+
+    orderbook = np.zeros(np.shape(orderbook_ask)[:-2] + (size, 4))
+    orderbook[..., :2] = join_levels(orderbook_ask, delta_join, size)
+    orderbook[..., 2:] = join_levels(orderbook_bid, delta_join, size)
+
+    return orderbook
+
+
+def get_padded(levels, source=None):
+    """ Mask (levels, 2) price and quantity levels repeating the previous
+    level, of the same source if given, like the last level padding books
+    to their limit.
+    """
+
+    padded = np.zeros(len(levels), dtype=bool)
+    padded[1:] = np.all(levels[1:] == levels[:-1], axis=1)
+
+    if source is not None:
+        padded[1:] &= source[1:] == source[:-1]
+
+    return padded
+
+
+class MergedBook:
+    """ Consolidated book of many exchanges.
+
+    The rows of a stacked orderbook are runs of levels, one per exchange,
+    already sorted from the best price. They are merged with a stable sort,
+    which merges the existing runs, into buffers reused between snapshots.
+    The source exchange of every merged level is kept, as well as which
+    levels only pad their exchange book.
+    """
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.source = np.repeat(np.arange(len(limits)), limits)
+        self.data = None
+        self.ask = None
+        self.bid = None
+        self.keys = None
+        self.ask_source = np.zeros(len(self.source), dtype=np.int64)
+        self.bid_source = np.zeros(len(self.source), dtype=np.int64)
+        self.ask_padded = np.zeros(len(self.source), dtype=bool)
+        self.bid_padded = np.zeros(len(self.source), dtype=bool)
+
+    def merge(self, orderbook):
+        """ Merge a stacked (levels, 4) orderbook. """
+
+        if self.ask is None or self.ask.dtype != orderbook.dtype:
+            self.ask = np.zeros((len(self.source), 2), dtype=orderbook.dtype)
+            self.bid = np.zeros((len(self.source), 2), dtype=orderbook.dtype)
+            self.keys = np.zeros((2, len(self.source)), dtype=orderbook.dtype)
+
+        # Asks ascending and bids descending, sorted in one call.
+        self.keys[0] = orderbook[:, 0]
+        np.negative(orderbook[:, 2], out=self.keys[1])
+        ask_order, bid_order = np.argsort(self.keys, axis=1, kind='stable')
+        np.take(orderbook[:, :2], ask_order, axis=0, out=self.ask)
+        np.take(orderbook[:, 2:], bid_order, axis=0, out=self.bid)
+        np.take(self.source, ask_order, out=self.ask_source)
+        np.take(self.source, bid_order, out=self.bid_source)
+        np.take(get_padded(orderbook[:, :2], self.source), ask_order,
+                out=self.ask_padded)
+        np.take(get_padded(orderbook[:, 2:], self.source), bid_order,
+                out=self.bid_padded)
+        self.ask += QTY_EPSILON
+        self.bid += QTY_EPSILON
+        self.data = orderbook
+
+    def get_depth(self, price, side="bid"):
+        """ Get quantity per exchange at prices as good as price or better.
+
+        Padding levels are not counted.
+        """
+
+        if side == "bid":
+            book, source = (self.bid, self.bid_source)
+            mask = (book[:, 0] >= price) & ~self.bid_padded
+        else:
+            book, source = (self.ask, self.ask_source)
+            mask = (book[:, 0] <= price) & ~self.ask_padded
+
+        return np.bincount(source[mask], weights=book[mask, 1],
+                           minlength=len(self.limits))
+
+
+def walk_levels(levels, amount, quote=False, limit=None):
+    """ Fill an amount walking (levels, 2) price and quantity levels from
+    the best one.
+
+    amount is a quantity, or a price * quantity value when quote is set,
+    as the amount of buy orders. Levels without price or quantity, and
+    levels repeating the previous one to pad the book, are skipped. With
+    a limit price, only levels at most limit are walked for buy orders,
+    and at least limit otherwise. Returns the filled part of amount, less
+    than amount when the levels run out, and what it is exchanged for, in
+    the other unit.
+    """
+
+    levels = np.asarray(levels, dtype=np.float64)
+    mask = (levels[:, 0] > 0) & (levels[:, 1] > 0) & ~get_padded(levels)
+
+    if limit is not None:
+        if quote:
+            mask &= levels[:, 0] <= limit
+        else:
+            mask &= levels[:, 0] >= limit
+
+    levels = levels[mask]
+    price, qty = (levels[:, 0], levels[:, 1])
+    size = price * qty if quote else qty
+
+    before = np.cumsum(size) - size
+    take = np.clip(amount - before, 0, size)
+    filled = min(amount, float(np.sum(size)))
+
+    if quote:
+        return filled, float(np.sum(take / price))
+
+    return filled, float(np.sum(take * price))
@@ -0,0 +1,88 @@
+'''
+Incremental valuation of account holdings.
+'''
+
+import numpy as np
+
+QUOTE_COIN = "USDT"  # coin tickers are priced in.
+
+
+class Portfolio:
+    """ Holdings and open order reservations of an account.
+
+    Holdings mirror the balance dict of the account, which is only changed
+    through the portfolio. Reservations are the amounts of open orders in
+    the coin they were sent from. Both are kept as vectors over coins, so
+    valuation is a dot product with a price vector.
+    """
+
+    def __init__(self, balance):
+        self.balance = balance
+        self.coins = []
+        self.index = dict()
+        self.holdings = np.zeros(0)
+        self.reserved = np.zeros(0)
+
+        for coin in balance:
+            self.add_coin(coin)
+
+    def add_coin(self, coin):
+        """ Track a coin, if it is not tracked yet. """
+
+        if coin in self.index:
+            return
+
+        self.index[coin] = len(self.coins)
+        self.coins.append(coin)
+        self.holdings = np.append(self.holdings, self.balance.get(coin, 0))
+        self.reserved = np.append(self.reserved, 0)
+        self.balance.setdefault(coin, 0)
+
+    def add(self, coin, amount):
+        """ Add an amount to the holdings of a coin. """
+
+        self.add_coin(coin)
+        self.balance[coin] += amount
+        self.holdings[self.index[coin]] = self.balance[coin]
+
+    def reserve(self, coin, amount):
+        """ Move an amount of holdings to an open order. """
+
+        self.add(coin, -amount)
+        self.reserved[self.index[coin]] += amount
+
+    def release(self, coin, amount):
+        """ Move an amount of an open order back to holdings. """
+
+        self.reserved[self.index[coin]] -= amount
+        self.add(coin, amount)
+
+    def settle(self, from_coin, amount, to_coin, received):
+        """ Exchange a reserved amount of a coin for another coin. """
+
+        self.reserved[self.index[from_coin]] -= amount
+        self.add(to_coin, received)
+
+    def get_value(self, prices, coin=QUOTE_COIN):
+        """ Get the value in a coin from prices of the tracked coins.
+
+        Prices are NaN for coins without data. Raises ValueError when a coin
+        with holdings or open orders has no price, or when the coin of the
+        value is not tracked or has no price.
+        """
+
+        if coin not in self.index or np.isnan(prices[self.index[coin]]):
+            raise ValueError("No price of %s to value the portfolio in." %
+                             coin)
+
+        totals = self.holdings + self.reserved
+        held = totals != 0
+        missing = held & np.isnan(prices)
+
+        if np.any(missing):
+            raise ValueError("No price of held coins %s." % ", ".join(
+                [self.coins[i] for i in np.flatnonzero(missing)]))
+
+        value = np.dot(totals[held], prices[held])
+
+        return value / prices[self.index[coin]]
@@ -0,0 +1,60 @@
+'''
+Fixed size buffers of the last values of a series.
+'''
+
+import numpy as np
+
+
+class RingBuffer:
+    """ Last size values of a series, oldest first.
+
+    Every value is written twice, size positions apart, in a buffer of
+    twice the size, so the last size values are always a contiguous slice
+    and get() returns a view without copying. The buffer is allocated on
+    the first append with the shape and dtype of the value, unless they are
+    set, and starts filled with fill.
+    """
+
+    def __init__(self, size, shape=None, dtype=None, fill=0):
+        self.size = size
+        self.fill = fill
+        self.data = None
+        self.position = 0
+
+        if dtype is not None:
+            self._allocate(() if shape is None else shape, dtype)
+
+    def _allocate(self, shape, dtype):
+        self.data = np.full((2 * self.size,) + tuple(shape), self.fill,
+                            dtype=dtype)
+
+    def append(self, value):
+        """ Append a value, dropping the oldest one. """
+
+        if self.data is None:
+            value = np.asarray(value)
+            self._allocate(value.shape, value.dtype)
+
+        self.data[self.position] = value
+        self.data[self.position + self.size] = value
+        self.position = (self.position + 1) % self.size
+
+    def get(self):
+        """ Get a view of the last size values. """
+
+        if self.data is None:
+            return np.full(self.size, self.fill)
+
+        return self.data[self.position:(self.position + self.size)]
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return self.get()[index]
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.get()
+
+        return self.get().astype(dtype)
@@ -1,8 +1,14 @@
 import argparse
+import os
 
 from database.config import EXCHANGE_DATA
+import numpy as np
+from simulation.checkpoint import load_checkpoint, save_checkpoint
 from simulation.exchange import SimulationExchange
 from simulation.logger import log
+from simulation.ring_buffer import RingBuffer
+from simulation.vectorized_runner import get_balance_log, \
+    load_market_series, run_vectorized
 from strategy.ichimoku import IchimokuStrategy
 from strategy.linear_regression import LinearRegressionStrategy
 from strategy.moving_average import MovingAverageStrategy
@@ -13,33 +19,231 @@ from strategy.srsi import SRsiStrategy
 from strategy.srsio import SRsiOscillatorStrategy
 
 
+STRATEGY_NAMES = ["rsi", "rsio", "srsi", "srsio", "ma", "mad", "lr", "ich"]
+
+
 class Strategy:
-    def __init__(self, trade_fee=0):
+    def __init__(self, trade_fee=0, name="rsi", streaming=False):
         self.trade_fee = trade_fee
-        self.strategy_rsi = RsiStrategy(15)
+        self.name = name
+        self.strategy_rsi = RsiStrategy(15, streaming=streaming)
         self.strategy_rsio = RsiOscillatorStrategy(15)
         self.strategy_srsi = SRsiStrategy(15)
-        self.strategy_srsi = SRsiOscillatorStrategy(15)
-        self.strategy_ma = MovingAverageStrategy(15, trade_fee)
+        self.strategy_srsio = SRsiOscillatorStrategy(15)
+        self.strategy_ma = MovingAverageStrategy(15, trade_fee,
+                                                 streaming=streaming)
         self.strategy_mad = MovingAverageDoubleStrategy(
-            period_1=9, period_2=21, trade_fee=trade_fee)
-        self.strategy_lr = LinearRegressionStrategy(15, trade_fee)
-        self.strategy_ich = IchimokuStrategy()
+            period_1=9, period_2=21, trade_fee=trade_fee, streaming=streaming)
+        self.strategy_lr = LinearRegressionStrategy(15, trade_fee, streaming)
+        self.strategy_ich = IchimokuStrategy(streaming=streaming)
+
+    def get_strategy(self):
+        """ Get the strategy consulted for decisions. """
+
+        return getattr(self, "strategy_" + self.name)
+
+    def update(self, ticker):
+        """ Give the last ticker value to streaming strategies. """
+
+        strategy = self.get_strategy()
+        if hasattr(strategy, "update"):
+            strategy.update(ticker)
 
     def should_buy(self, ticker_data, orderbook_data):
         """ Check if we should buy. """
 
-        decision = self.strategy_rsi.should_buy(ticker_data)
+        decision = self.get_strategy().should_buy(ticker_data)
 
         return decision
 
     def should_sell(self, ticker_data, orderbook_data):
         """ Check if we should sell. """
 
-        decision = self.strategy_rsi.should_sell(ticker_data)
+        decision = self.get_strategy().should_sell(ticker_data)
 
         return decision
 
+    def compute_signals(self, ticker_series, window=None):
+        """ Compute buy and sell signals of every tick of a series. """
+
+        return self.get_strategy().compute_signals(ticker_series, window)
+
+
+def run_simulation(exchange, strategy, coin="BTC", base_coin="USDT",
+                   periods=78, trade_fee=0.001, stop_loss_rate=0.025,
+                   wait_sell_time=5 * 60, init_trading_time=78 * 60,
+                   log_balance_interval=60 * 60, verbose=True,
+                   checkpoint_path=None, checkpoint_interval=None,
+                   resume=False):
+    """ Run the event loop until data ends.
+
+    Returns the (timestamp, balance) pairs logged in every interval.
+    """
+
+    return run_simulations(
+        exchange, [(exchange.account, strategy)], coin, base_coin, periods,
+        trade_fee, stop_loss_rate, wait_sell_time, init_trading_time,
+        log_balance_interval, verbose, checkpoint_path, checkpoint_interval,
+        resume)[0]
+
+
+def run_simulations(exchange, pairs, coin="BTC", base_coin="USDT",
+                    periods=78, trade_fee=0.001, stop_loss_rate=0.025,
+                    wait_sell_time=5 * 60, init_trading_time=78 * 60,
+                    log_balance_interval=60 * 60, verbose=True,
+                    checkpoint_path=None, checkpoint_interval=None,
+                    resume=False):
+    """ Run the event loop of many (account, strategy) pairs until data ends.
+
+    All pairs share the exchange data and the ticker window, and each
+    trades with its own account. Returns the (timestamp, balance) pairs
+    logged in every interval, one list per pair.
+
+    With checkpoint_path, the state of the simulation is saved there when
+    data ends and every checkpoint_interval seconds of data, if set. With
+    resume, the simulation continues from the saved state, if any.
+    """
+
+    last_time = init_time = exchange.get_timestamp()
+    enable_trading = False
+    wait_sell_time_start = [0] * len(pairs)
+    bought_price = [0] * len(pairs)
+    ticker_window = RingBuffer(periods)
+    orderbook_window = RingBuffer(periods)
+    timestamp_window = RingBuffer(periods, dtype=np.int64)
+    timestamp_window.append(999999)
+    period_sec = periods * 60
+    period_sec_error = 1800
+    balance_logs = [[] for _ in pairs]
+
+    def save():
+        state = dict()
+        state["exchange"] = exchange.get_state()
+        state["strategies"] = [strategy for account, strategy in pairs]
+        state["windows"] = [ticker_window, orderbook_window,
+                            timestamp_window]
+        state["runner"] = [init_time, last_time, enable_trading,
+                           wait_sell_time_start, bought_price, balance_logs]
+        save_checkpoint(checkpoint_path, state)
+
+    if resume and checkpoint_path is not None and \
+            os.path.exists(checkpoint_path):
+        state = load_checkpoint(checkpoint_path)
+
+        if len(state["strategies"]) != len(pairs):
+            raise ValueError("Checkpoint has %d strategies, not %d." %
+                             (len(state["strategies"]), len(pairs)))
+
+        exchange.set_state(state["exchange"])
+        pairs = [(account, strategy) for (account, _), strategy in
+                 zip(pairs, state["strategies"])]
+        ticker_window, orderbook_window, timestamp_window = state["windows"]
+        init_time, last_time, enable_trading, wait_sell_time_start, \
+            bought_price, balance_logs = state["runner"]
+
+    last_checkpoint_time = exchange.get_timestamp()
+
+    while True:
+        # Get current data.
+        while True:
+            try:
+                exchange.increment_time()
+            except StopIteration:
+                if checkpoint_path is not None:
+                    save()
+
+                return balance_logs
+
+            orderbook = exchange.get_orderbook(coin)
+            orderbook_join = exchange.get_orderbook_join(coin)
+            ticker_join = exchange.get_ticker_join(coin)
+            time_now = exchange.get_timestamp()
+            ticker_window.append(ticker_join)
+            orderbook_window.append(orderbook_join)
+            timestamp_window.append(time_now)
+            timestamp_data = timestamp_window.get()
+
+            for account, strategy in pairs:
+                if hasattr(strategy, "update"):
+                    strategy.update(ticker_join)
+
+            if abs(timestamp_data[-1] - timestamp_data[0]
+                   - period_sec) < period_sec_error:
+                break
+
+        # Views of the windows, valid until the next append.
+        ticker_data = ticker_window.get()
+        orderbook_data = orderbook_window.get()
+
+        for i, (account, strategy) in enumerate(pairs):
+            if enable_trading:
+                # Check if we should buy or sell.
+                if strategy.should_buy(ticker_data, orderbook_data):
+                    from_coin = base_coin
+                    to_coin = coin
+                    account.cancel_orders(to_coin, "sell")
+
+                    if account.get_balance(from_coin) > 0:
+                        # Send buy order.
+                        account.send_order(from_coin, to_coin,
+                                           orderbook[0][2],
+                                           account.get_balance(from_coin),
+                                           "buy")
+                        bought_price[i] = orderbook[0][2]
+                        wait_sell_time_start[i] = exchange.get_timestamp()
+                else:
+                    stop_loss = orderbook[0][2] * (1 - trade_fee) <= \
+                                bought_price[i] * (1 + trade_fee -
+                                                   stop_loss_rate)
+
+                    if (strategy.should_sell(ticker_data, orderbook_data) and
+                        (exchange.get_timestamp() - wait_sell_time_start[i]) >=
+                         wait_sell_time) or stop_loss:
+
+                        from_coin = coin
+                        to_coin = base_coin
+                        account.cancel_orders(from_coin, "buy")
+
+                        if account.get_balance(coin) > 0:
+                            # Send sell order.
+                            account.send_order(from_coin, to_coin,
+                                               orderbook[0][2],
+                                               account.get_balance(from_coin),
+                                               "sell")
+
+            # Simulate order execution.
+            if account.has_order():
+                account.execute_order()
+
+        # Wait data initialization, before start trading.
+        if not enable_trading and (exchange.get_timestamp() - init_time) >= \
+                init_trading_time:
+
+            # Enable trading.
+            enable_trading = True
+            if verbose:
+                log(exchange.get_timestamp(), "Start trading.")
+
+        # Log balance in every interval set.
+        if abs(exchange.get_timestamp() - last_time) > log_balance_interval:
+            last_time = exchange.get_timestamp()
+
+            for i, (account, strategy) in enumerate(pairs):
+                balance_total = account.get_balance_total(base_coin)
+                balance_logs[i].append((last_time, balance_total))
+
+                if verbose:
+                    log(exchange.get_timestamp(), "%sBalance %f %s." %
+                        ("[%s] " % getattr(strategy, "name", i)
+                         if len(pairs) > 1 else "",
+                         balance_total, base_coin))
+
+        if checkpoint_path is not None and checkpoint_interval is not None \
+                and exchange.get_timestamp() - last_checkpoint_time >= \
+                checkpoint_interval:
+            last_checkpoint_time = exchange.get_timestamp()
+            save()
+
 
 if __name__ == "__main__":
     """
@@ -53,6 +257,33 @@ if __name__ == "__main__":
     parser.add_argument('coin', type=str, nargs='?',
                         default="BTC",
                         help='coin used to read data')
+    parser.add_argument('--start', type=int, default=None,
+                        help='first timestamp to simulate')
+    parser.add_argument('--end', type=int, default=None,
+                        help='last timestamp to simulate')
+    parser.add_argument('--cache', action='store_true',
+                        help='read aligned samples from the cache')
+    parser.add_argument('--prefetch', type=str, default=None,
+                        choices=['thread', 'process'],
+                        help='decode exchanges in background workers')
+    parser.add_argument('--engine', type=str, default="event",
+                        choices=['event', 'vectorized'],
+                        help='simulate tick by tick or whole history arrays')
+    parser.add_argument('--strategies', type=str, nargs='+',
+                        default=["rsi"], choices=STRATEGY_NAMES,
+                        help='strategies evaluated in the same data pass')
+    parser.add_argument('--fill-model', type=str, default="limit",
+                        choices=['limit', 'depth'],
+                        help='fill orders at their price or walking levels')
+    parser.add_argument('--streaming', action='store_true',
+                        help='update indicators with every ticker value '
+                        'instead of computing them on each window')
+    parser.add_argument('--checkpoint', type=str, default=None,
+                        help='file where the simulation state is saved')
+    parser.add_argument('--checkpoint-interval', type=int, default=None,
+                        help='seconds of data between checkpoints')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue from the checkpoint file')
     args = parser.parse_args()
     database_dir = str(args.database_dir)
     coin = args.coin
@@ -70,98 +301,54 @@ if __name__ == "__main__":
     init_trading_time = periods * 60 * 1  # in seconds.
 #     log_balance_interval = 60 * 60 * 24  # in seconds.
     log_balance_interval = 60 * 60  # in seconds.
-
-    # Initialize models.
-    exchange = SimulationExchange(
-        balance, trade_fee, max_delay_order, database_dir)
-    last_time = init_time = exchange.get_timestamp()
-    enable_trading = False
-    trade_placed = False
     stop_loss_rate = 0.025  # [0, 1]
-    wait_sell_time = 5 * 60 # in seconds.
-    wait_sell_time_start = 0
-    bought_price = 0
-    strategy = Strategy(trade_fee)
-    ticker_data = [0] * periods
-    orderbook_data = [0] * periods
-    timestamp_data = [0] * periods
-    timestamp_data[-1] = 999999
-    period_sec = periods * 60
-    period_sec_error = 1800
+    wait_sell_time = 5 * 60  # in seconds.
+    strategies = [Strategy(trade_fee, name, args.streaming)
+                  for name in args.strategies]
 
-    while True:
-        # Get current data.
-        while True:
-            exchange.increment_time()
-            orderbook = exchange.get_orderbook()
-            orderbook_join = exchange.get_orderbook_join()
-            ticker_join = exchange.get_ticker_join()
-            time_now = exchange.get_timestamp()
-            ticker_data.pop(0)
-            orderbook_data.pop(0)
-            timestamp_data.pop(0)
-            ticker_data.append(ticker_join)
-            orderbook_data.append(orderbook_join)
-            timestamp_data.append(time_now)
+    if args.prefetch is not None and args.checkpoint is not None:
+        parser.error("prefetched samples cannot be checkpointed")
 
-            if abs(timestamp_data[-1] - timestamp_data[0]
-                   - period_sec) < period_sec_error:
-                break
+    if args.engine == "vectorized":
+        if args.fill_model != "limit":
+            parser.error("the vectorized engine only fills at order prices")
 
-        if enable_trading:
-            # Check if we should buy or sell.
-            if strategy.should_buy(ticker_data, orderbook_data):
-                from_coin = base_coin
-                to_coin = coin
-                exchange.cancel_orders(to_coin, "sell")
-
-                if exchange.get_balance(from_coin) > 0:
-                    # Send buy order.
-                    exchange.send_order(from_coin, to_coin,
-                                        orderbook[0][2],
-                                        exchange.get_balance(from_coin),
-                                        "buy")
-                    bought_price = orderbook[0][2]
-                    wait_sell_time_start = exchange.get_timestamp()
-            else:
-                stop_loss = orderbook[0][2] * (1 - trade_fee) <= \
-                            bought_price * (1 + trade_fee - stop_loss_rate)
-
-                if (strategy.should_sell(ticker_data, orderbook_data) and
-                    (exchange.get_timestamp() - wait_sell_time_start) >= 
-                     wait_sell_time) or stop_loss:
-
-                    from_coin = coin
-                    to_coin = base_coin
-                    exchange.cancel_orders(from_coin, "buy")
-
-                    if exchange.get_balance(coin) > 0:
-                        # Send sell order.
-                        exchange.send_order(from_coin, to_coin,
-                                            orderbook[0][2],
-                                            exchange.get_balance(from_coin),
-                                            "sell")
-
-#             if strategy.should_buy(ticker_data, orderbook_data) or \
-#                     strategy.should_sell(ticker_data, orderbook_data):
-#                 log(exchange.get_timestamp(), "Balance %f %s." %
-#                     (exchange.get_balance_total(base_coin), base_coin))
-#                 time.sleep(1)
-
-        # Simulate order execution.
-        if exchange.has_order():
-            exchange.execute_order()
+        market = load_market_series(database_dir, coin, start=args.start,
+                                    end=args.end, cache=args.cache,
+                                    prefetch=args.prefetch)
 
-        # Wait data initialization, before start trading.
-        if not enable_trading and (exchange.get_timestamp() - init_time) >= \
-                init_trading_time:
+        if len(market["timestamp"]) == 0:
+            parser.error("no samples to simulate")
 
-            # Enable trading.
-            enable_trading = True
-            log(exchange.get_timestamp(), "Start trading.")
+        for strategy in strategies:
+            result = run_vectorized(
+                market, strategy, dict(balance), coin, base_coin, periods,
+                trade_fee, max_delay_order, stop_loss_rate, wait_sell_time,
+                init_trading_time)
 
-        # Log balance in every interval set.
-        if abs(exchange.get_timestamp() - last_time) > log_balance_interval:
-            last_time = exchange.get_timestamp()
-            log(exchange.get_timestamp(), "Balance %f %s." %
-                (exchange.get_balance_total(base_coin), base_coin))
+            for timestamp, balance_total in get_balance_log(
+                    result, log_balance_interval):
+                log(timestamp, "%sBalance %f %s." %
+                    ("[%s] " % strategy.name if len(strategies) > 1 else "",
+                     balance_total, base_coin))
+    else:
+        # Initialize models.
+        try:
+            exchange = SimulationExchange(
+                dict(balance), trade_fee, max_delay_order, database_dir,
+                cache=args.cache, coins=[coin], start=args.start,
+                end=args.end, fill_model=args.fill_model,
+                prefetch=args.prefetch)
+        except StopIteration:
+            parser.error("no samples to simulate")
+
+        pairs = [(exchange.account, strategies[0])]
+        for strategy in strategies[1:]:
+            pairs.append((exchange.add_account(dict(balance)), strategy))
+
+        run_simulations(exchange, pairs, coin, base_coin, periods,
+                        trade_fee, stop_loss_rate, wait_sell_time,
+                        init_trading_time, log_balance_interval,
+                        checkpoint_path=args.checkpoint,
+                        checkpoint_interval=args.checkpoint_interval,
+                        resume=args.resume)
\ No newline at end of file
@@ -0,0 +1,237 @@
+'''
+Parallel parameter sweep over shared market data.
+'''
+
+import argparse
+import csv
+from itertools import product
+import json
+from multiprocessing import cpu_count, Pool
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from simulation.vectorized_runner import load_market_series, run_vectorized
+from strategy.moving_average import MovingAverageStrategy
+from strategy.moving_average_double import MovingAverageDoubleStrategy
+from strategy.rsi import RsiStrategy
+
+DEFAULT_GRID = {
+    "strategy": ["rsi"],
+    "periods": [78],
+    "trade_fee": [0.001],
+    "stop_loss_rate": [0.025],
+    "max_delay_order": [1],
+    "wait_sell_time": [5 * 60],
+    "seed": [0],  # of order fill delays.
+    "rsi_periods": [15],
+    "buy_rate": [20],
+    "sell_rate": [80],
+    "ma_periods": [15],
+    "period_1": [9],
+    "period_2": [21],
+    "exponential": [False]
+}
+
+# Grid keys of each strategy, besides the ones of the runner.
+STRATEGY_KEYS = {
+    "rsi": ["rsi_periods", "buy_rate", "sell_rate"],
+    "ma": ["ma_periods", "exponential"],
+    "mad": ["period_1", "period_2", "exponential"]
+}
+RUNNER_KEYS = ["strategy", "periods", "trade_fee", "stop_loss_rate",
+               "max_delay_order", "wait_sell_time", "seed"]
+
+_market = dict()
+_shared = []
+_balance = dict()
+
+
+def share_market(market):
+    """ Copy market arrays to shared memory.
+
+    Returns the shared memory blocks and the specs to attach to them.
+    """
+
+    blocks, specs = ([], dict())
+
+    for key, values in market.items():
+        values = np.ascontiguousarray(values)
+        block = SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, values.dtype, buffer=block.buf)[:] = values
+        blocks.append(block)
+        specs[key] = (block.name, values.shape, values.dtype.str)
+
+    return blocks, specs
+
+
+def _attach_market(specs, balance):
+    """ Attach a worker to the shared market arrays. """
+
+    for key, (name, shape, dtype) in specs.items():
+        block = SharedMemory(name=name)
+        _shared.append(block)
+        _market[key] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+
+    _balance.update(balance)
+
+
+def compute_drawdown(balance_total):
+    """ Compute the maximum drawdown rate of a balance series. """
+
+    if len(balance_total) == 0:
+        return 0.0
+
+    peak = np.maximum.accumulate(balance_total)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = np.where(peak > 0, (peak - balance_total) / peak, 0)
+
+    return float(np.max(drawdown))
+
+
+def get_strategy(config):
+    """ Get the strategy of a configuration, "rsi", "ma" or "mad". """
+
+    if config["strategy"] == "ma":
+        return MovingAverageStrategy(config["ma_periods"], config["trade_fee"],
+                                     config["exponential"])
+
+    if config["strategy"] == "mad":
+        return MovingAverageDoubleStrategy(
+            config["period_1"], config["period_2"], config["trade_fee"],
+            config["exponential"])
+
+    return RsiStrategy(config["rsi_periods"], config["buy_rate"],
+                       config["sell_rate"])
+
+
+def run_config(config, coin="BTC", base_coin="USDT"):
+    """ Run the vectorized engine for one configuration. """
+
+    strategy = get_strategy(config)
+    result = run_vectorized(
+        _market, strategy, dict(_balance), coin, base_coin,
+        config["periods"], config["trade_fee"], config["max_delay_order"],
+        config["stop_loss_rate"], config["wait_sell_time"],
+        config["periods"] * 60, config["seed"])
+
+    row = dict(config)
+    if len(result["balance_total"]) > 0:
+        row["balance"] = float(result["balance_total"][-1])
+    else:
+        row["balance"] = float(_balance[base_coin])
+    row["trades"] = result["trades"]
+    row["drawdown"] = compute_drawdown(result["balance_total"])
+
+    return row
+
+
+def get_configs(grid):
+    """ Get every configuration of a parameter grid.
+
+    Each strategy only combines its own keys with the ones of the runner,
+    so keys of other strategies do not repeat its configurations. Keys
+    missing from DEFAULT_GRID raise ValueError.
+    """
+
+    unknown = sorted(set(grid) - set(DEFAULT_GRID))
+    if len(unknown) > 0:
+        raise ValueError("Unknown grid keys %s." % ", ".join(unknown))
+
+    grid = dict(DEFAULT_GRID, **grid)
+    configs = []
+
+    for strategy in grid["strategy"]:
+        if strategy not in STRATEGY_KEYS:
+            raise ValueError("Unknown strategy %s." % strategy)
+
+        keys = RUNNER_KEYS + STRATEGY_KEYS[strategy]
+        values = [[strategy]] + [grid[key] for key in keys[1:]]
+        configs.extend([dict(zip(keys, config))
+                        for config in product(*values)])
+
+    return configs
+
+
+def run_sweep(market, grid, balance, processes=None):
+    """ Run every configuration of a parameter grid in a process pool.
+
+    Market arrays are shared with the workers instead of copied. Returns
+    one row per configuration with its final balance, trades and maximum
+    drawdown.
+    """
+
+    configs = get_configs(grid)
+
+    if processes is None:
+        processes = cpu_count()
+
+    blocks, specs = share_market(market)
+    try:
+        with Pool(processes, initializer=_attach_market,
+                  initargs=(specs, balance)) as pool:
+            rows = pool.map(run_config, configs)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Run a parameter sweep')
+    parser.add_argument('database_dir', type=str,
+                        help='directory where data will be read')
+    parser.add_argument('coin', type=str, nargs='?',
+                        default="BTC",
+                        help='coin used to read data')
+    parser.add_argument('--grid', type=str, default="{}",
+                        help='JSON dict of parameter lists to sweep')
+    parser.add_argument('--start', type=int, default=None,
+                        help='first timestamp to simulate')
+    parser.add_argument('--end', type=int, default=None,
+                        help='last timestamp to simulate')
+    parser.add_argument('--cache', action='store_true',
+                        help='read aligned samples from the cache')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of worker processes')
+    parser.add_argument('--output', type=str, default=None,
+                        help='CSV file where results will be saved')
+    args = parser.parse_args()
+    database_dir = str(args.database_dir)
+    coin = args.coin
+
+    grid = json.loads(args.grid)
+    try:
+        get_configs(grid)
+    except ValueError as error:
+        parser.error(str(error))
+
+    base_coin = "USDT"
+    balance = {base_coin: 100, coin: 0}  # in dollars.
+    market = load_market_series(database_dir, coin, start=args.start,
+                                end=args.end, cache=args.cache)
+
+    if len(market["timestamp"]) == 0:
+        parser.error("no samples to simulate")
+
+    rows = run_sweep(market, grid, balance, args.processes)
+    rows = sorted(rows, key=lambda row: row["balance"], reverse=True)
+
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            # Rows of each strategy have their own keys, results last.
+            results = ["balance", "trades", "drawdown"]
+            fieldnames = []
+            for row in rows:
+                fieldnames.extend([key for key in row
+                                   if key not in fieldnames + results])
+            fieldnames.extend(results)
+
+            writer = csv.DictWriter(output_file, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    for row in rows:
+        print(" | ".join(["%s: %s" % (key, row[key]) for key in row]))
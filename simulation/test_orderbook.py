@@ -0,0 +1,90 @@
+'''
+Tests of order fills walking book levels.
+
+Run with python -m unittest from the repository root.
+'''
+
+import unittest
+
+import numpy as np
+from simulation.account import SimulationAccount
+from simulation.order_store import FILLED, OPEN
+from simulation.orderbook import walk_levels
+
+ASKS = np.array([[100, 1], [101, 1], [150, 5]], dtype=np.float32)
+BIDS = np.array([[99, 1], [98, 1], [50, 5]], dtype=np.float32)
+
+
+class BookExchange:
+    """ Exchange with a fixed book, filling orders as SimulationExchange. """
+
+    def __init__(self):
+        self.timestamp = 0
+
+    def get_timestamp(self):
+        return self.timestamp
+
+    def get_fill(self, coin, order_type, amount, price=None):
+        if order_type == "buy":
+            return walk_levels(ASKS, amount, quote=True, limit=price)
+
+        return walk_levels(BIDS, amount, limit=price)
+
+
+class WalkLevelsTest(unittest.TestCase):
+
+    def test_walks_whole_book_without_limit(self):
+        filled, received = walk_levels(ASKS, 300, quote=True)
+
+        self.assertAlmostEqual(filled, 300)
+        self.assertAlmostEqual(received, 1 + 1 + 99 / 150.0)
+
+    def test_buy_stops_at_limit(self):
+        filled, received = walk_levels(ASKS, 300, quote=True, limit=100)
+
+        self.assertAlmostEqual(filled, 100)
+        self.assertAlmostEqual(received, 1)
+
+    def test_sell_stops_at_limit(self):
+        filled, received = walk_levels(BIDS, 3, limit=98)
+
+        self.assertAlmostEqual(filled, 2)
+        self.assertAlmostEqual(received, 99 + 98)
+
+    def test_skips_padding_levels(self):
+        padded = np.concatenate((BIDS, np.repeat(BIDS[-1:], 3, axis=0)))
+
+        self.assertAlmostEqual(walk_levels(padded, 100)[0], 7)
+
+
+class DepthFillTest(unittest.TestCase):
+
+    def test_residual_beyond_limit_is_retried(self):
+        exchange = BookExchange()
+        account = SimulationAccount(exchange, {"USDT": 300, "BTC": 0},
+                                    trade_fee=0, max_delay_order=1,
+                                    fill_model="depth")
+        account.send_order("USDT", "BTC", 100, 300, "buy")
+        order = account.orders.get(0)
+
+        exchange.timestamp = order.fill_time
+        account.execute_order()
+
+        self.assertEqual(order.status, OPEN)
+        self.assertAlmostEqual(order.filled, 100)
+        self.assertAlmostEqual(order.amount, 200)
+        self.assertEqual(order.fill_time, exchange.timestamp + 60)
+        self.assertAlmostEqual(account.get_balance("BTC"), 1)
+
+        # The level at the limit is back in the next books.
+        for _ in range(2):
+            exchange.timestamp = order.fill_time
+            account.execute_order()
+
+        self.assertEqual(order.status, FILLED)
+        self.assertAlmostEqual(order.filled, 300)
+        self.assertAlmostEqual(account.get_balance("BTC"), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
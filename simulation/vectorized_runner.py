@@ -0,0 +1,282 @@
+'''
+Whole-history backtest engine.
+
+Loads the aligned ticker series of a coin once, computes strategy signals
+as arrays and only steps through ticks where the account can change, giving
+the same balances as the event loop of simulation_runner.
+'''
+
+import heapq
+import random
+
+from database.aligned_cache import load_aligned
+from database.data_generator import sample_generator
+from database.data_layout import DataLayout
+import numpy as np
+from simulation.account import DELAY_UNIT
+from simulation.orderbook import join_levels
+
+PERIOD_SEC_ERROR = 1800  # in seconds.
+
+
+def _chunk_samples(generator, chunk_size):
+    x, timestamps = ([], [])
+
+    for data, timestamp in generator:
+        x.append(data)
+        timestamps.append(timestamp)
+
+        if len(x) == chunk_size:
+            yield np.array(x), np.array(timestamps, dtype=np.int64)
+            x, timestamps = ([], [])
+
+    if len(x) > 0:
+        yield np.array(x), np.array(timestamps, dtype=np.int64)
+
+
+def load_market_series(database_dir, coin="BTC", exchange="binance",
+                       start=None, end=None, cache=True, chunk_size=4096,
+                       prefetch=None):
+    """ Load the per-tick series used by the runner for a time range.
+
+    Returns a dict of arrays: timestamp, ticker (best bid of the exchange),
+    ticker_join (mean best bid of all exchanges) and price (first joined bid
+    level of the exchange, as get_orderbook()[0][2]). Without cache,
+    samples are decoded in prefetch workers, if set.
+    """
+
+    layout = DataLayout([coin])
+    rows = layout.get_slice(coin, exchange)
+    tops = layout.tops[coin]
+
+    if cache:
+        data, timestamps = load_aligned(database_dir, coin)
+        first = 0 if start is None else \
+            int(np.searchsorted(timestamps, start, side='left'))
+        last = len(timestamps) if end is None else \
+            int(np.searchsorted(timestamps, end, side='right'))
+        chunks = ((data[i:min(i + chunk_size, last)],
+                   timestamps[i:min(i + chunk_size, last)])
+                  for i in range(first, last, chunk_size))
+    else:
+        chunks = _chunk_samples(
+            sample_generator(database_dir, coin, start=start, end=end,
+                             prefetch=prefetch),
+            chunk_size)
+
+    market = dict([(key, []) for key in
+                   ["timestamp", "ticker", "ticker_join", "price"]])
+
+    for x, timestamps in chunks:
+        market["timestamp"].append(np.asarray(timestamps, dtype=np.int64))
+        market["ticker"].append(x[:, rows.start, 2])
+        market["ticker_join"].append(np.mean(x[:, tops, 2], axis=1))
+        market["price"].append(join_levels(x[:, rows, 2:], size=1)[:, 0, 0])
+
+    for key in market:
+        if len(market[key]) > 0:
+            market[key] = np.concatenate(market[key])
+        else:
+            market[key] = np.zeros(0)
+
+    return market
+
+
+def _find_first(condition, start, size, chunk_size=1024):
+    """ Get first index in [start, size) where condition(first, last) holds,
+    scanning growing chunks. Returns size if there is none.
+    """
+
+    while start < size:
+        stop = min(start + chunk_size, size)
+        hits = np.flatnonzero(condition(start, stop))
+
+        if len(hits) > 0:
+            return start + int(hits[0])
+
+        start = stop
+        chunk_size *= 2
+
+    return size
+
+
+def run_vectorized(market, strategy, balance, coin="BTC", base_coin="USDT",
+                   periods=78, trade_fee=0.001, max_delay_order=1,
+                   stop_loss_rate=0.025, wait_sell_time=5 * 60,
+                   init_trading_time=78 * 60, seed=None):
+    """ Backtest a strategy over a whole market series.
+
+    The first sample initializes the exchange, as in the event loop. The
+    strategy computes buy and sell signals of every tick at once with
+    compute_signals, over windows of at most periods values like the ones
+    of the event loop. Orders and balances are only updated at ticks where
+    a signal sends or cancels orders or a pending order fills, and
+    balances of the other ticks are filled from them.
+
+    Returns a dict with the timestamp, balance_total, base and coin
+    balances of every tick evaluated by the event loop, the init_time and
+    the number of executed trades. An empty market has no ticks and no
+    init_time.
+    """
+
+    if len(market["timestamp"]) == 0:
+        result = dict()
+        result["timestamp"] = np.zeros(0, dtype=np.int64)
+        result["balance_total"] = np.zeros(0)
+        result["base"] = np.zeros(0)
+        result["coin"] = np.zeros(0)
+        result["init_time"] = None
+        result["trades"] = 0
+
+        return result
+
+    init_time = market["timestamp"][0]
+    timestamps = market["timestamp"][1:]
+    buy, sell = strategy.compute_signals(market["ticker_join"][1:], periods)
+
+    # Ticks whose window spans the period, where the event loop trades.
+    period_sec = periods * 60
+    ticks = np.arange(periods - 1, len(timestamps))
+    ticks = ticks[np.abs(timestamps[ticks] - timestamps[ticks - periods + 1] -
+                         period_sec) < PERIOD_SEC_ERROR]
+
+    time_now = timestamps[ticks]
+    price = market["price"][1:][ticks]
+    ticker = market["ticker"][1:][ticks]
+    buy, sell = (buy[ticks], sell[ticks])
+    size = len(ticks)
+
+    # Trading starts at the tick after the initialization time.
+    enabled = np.flatnonzero(time_now - init_time >= init_trading_time)
+    i = int(enabled[0]) + 1 if len(enabled) > 0 else size
+
+    rng = random.Random(seed)
+    base, amount = (balance[base_coin], balance[coin])
+    orders, fill_queue, order_id, trades = (dict(), [], 0, 0)
+    bought_price, wait_sell_time_start = (0, 0)
+    marks = [(0, base, amount, 0, 0)]
+
+    def can_sell(first, last):
+        stop_loss = price[first:last] * (1 - trade_fee) <= \
+            bought_price * (1 + trade_fee - stop_loss_rate)
+
+        return ~buy[first:last] & (stop_loss | (
+            sell[first:last] &
+            (time_now[first:last] - wait_sell_time_start >= wait_sell_time)))
+
+    def cancel(order_type):
+        cancelled = 0
+
+        for key in [key for key in orders if orders[key][0] == order_type]:
+            cancelled += orders.pop(key)[1]
+
+        return cancelled
+
+    def send(order_type, order_amount):
+        nonlocal order_id
+
+        fill_time = time_now[i] + \
+            rng.randint(1, max_delay_order) * DELAY_UNIT
+        orders[order_id] = (order_type, order_amount, price[i])
+        heapq.heappush(fill_queue, (fill_time, order_id))
+        order_id += 1
+
+    while i < size:
+        # Nothing changes until a signal acts or an order fills.
+        has_buy = any([order[0] == "buy" for order in orders.values()])
+        has_sell = any([order[0] == "sell" for order in orders.values()])
+        next_i = size
+        if base > 0 or has_sell:
+            next_i = _find_first(lambda first, last: buy[first:last], i, size)
+        if amount > 0 or has_buy:
+            next_i = min(next_i, _find_first(can_sell, i, size))
+        while len(fill_queue) > 0 and fill_queue[0][1] not in orders:
+            heapq.heappop(fill_queue)
+        if len(fill_queue) > 0:
+            next_i = min(next_i, int(np.searchsorted(
+                time_now, fill_queue[0][0], side='left')))
+
+        i = max(next_i, i)
+        if i >= size:
+            break
+
+        if buy[i]:
+            amount += cancel("sell")
+
+            if base > 0:
+                send("buy", base)
+                base = 0
+                bought_price = price[i]
+                wait_sell_time_start = time_now[i]
+        else:
+            stop_loss = price[i] * (1 - trade_fee) <= \
+                bought_price * (1 + trade_fee - stop_loss_rate)
+
+            if (sell[i] and (time_now[i] - wait_sell_time_start) >=
+                    wait_sell_time) or stop_loss:
+                base += cancel("buy")
+
+                if amount > 0:
+                    send("sell", amount)
+                    amount = 0
+
+        while len(fill_queue) > 0 and fill_queue[0][0] <= time_now[i]:
+            key = heapq.heappop(fill_queue)[1]
+
+            if key not in orders:
+                continue
+
+            order_type, order_amount, order_price = orders.pop(key)
+
+            if order_type == "buy":
+                amount += order_amount / order_price * (1.0 - trade_fee)
+            else:
+                base += order_amount * order_price * (1.0 - trade_fee)
+
+            trades += 1
+
+        marks.append((i,
+                      base, amount,
+                      sum([order[1] for order in orders.values()
+                           if order[0] == "buy"]),
+                      sum([order[1] for order in orders.values()
+                           if order[0] == "sell"])))
+        i += 1
+
+    # Balances are constant between marks.
+    marks = np.array(marks, dtype=np.float64)
+    mark_index = np.searchsorted(marks[:, 0], np.arange(size),
+                                 side='right') - 1
+    marks = marks[mark_index]
+    balance_total = marks[:, 1] + marks[:, 2] * ticker + marks[:, 3] + \
+        marks[:, 4] * ticker
+
+    result = dict()
+    result["timestamp"] = time_now
+    result["balance_total"] = balance_total
+    result["base"] = marks[:, 1]
+    result["coin"] = marks[:, 2]
+    result["init_time"] = init_time
+    result["trades"] = trades
+
+    return result
+
+
+def get_balance_log(result, log_balance_interval=60 * 60):
+    """ Get the (timestamp, balance) pairs logged by the event loop. """
+
+    time_now = result["timestamp"]
+    last_time = result["init_time"]
+    balance_log = []
+    i = 0
+
+    while i < len(time_now):
+        i = int(np.searchsorted(time_now, last_time + log_balance_interval,
+                                side='right'))
+        if i >= len(time_now):
+            break
+
+        last_time = time_now[i]
+        balance_log.append((int(last_time), result["balance_total"][i]))
+
+    return balance_log
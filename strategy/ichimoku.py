@@ -1,4 +1,7 @@
+from collections import deque
+
 import numpy as np
+from strategy.rolling import RollingExtrema, rolling_max, rolling_min
 
 
 def compute_ichimoku(data, tenkan=9, kijun=26, senkou=52,
@@ -30,26 +33,166 @@ def compute_ichimoku(data, tenkan=9, kijun=26, senkou=52,
     return tenkan_sen, kijun_sen, senkou_span_a, senkou_span_b, chikou_span
 
 
+def compute_ichimoku_series(data, tenkan=9, kijun=26, senkou=52,
+                            senkou_lead=26, chikou=26):
+    """ Compute Ichimoku lines of every window of a series.
+
+    Item i of each line is the one of compute_ichimoku over
+    data[i:(i + size)], where size = senkou + senkou_lead is the span the
+    lines depend on.
+    """
+
+    data = np.asarray(data)
+    size = senkou + senkou_lead
+    ends = np.arange(size, len(data) + 1)
+
+    def middle(window, ends):
+        return (rolling_max(data, window)[ends - window] +
+                rolling_min(data, window)[ends - window]) / 2.0
+
+    lag_ends = ends - senkou_lead
+    tenkan_sen = middle(tenkan, ends)
+    kijun_sen = middle(kijun, ends)
+    senkou_span_a = (middle(tenkan, lag_ends) +
+                     middle(kijun, lag_ends)) / 2.0
+    senkou_span_b = middle(senkou, lag_ends)
+    chikou_span = data[ends - chikou]
+
+    return tenkan_sen, kijun_sen, senkou_span_a, senkou_span_b, chikou_span
+
+
+class IchimokuStream:
+    """ Ichimoku lines of a growing series, in O(1) amortized per value.
+
+    Once senkou_lead and chikou values are given, update returns the lines
+    of compute_ichimoku over all values so far.
+    """
+
+    def __init__(self, tenkan=9, kijun=26, senkou=52, senkou_lead=26,
+                 chikou=26):
+        self.tenkan = RollingExtrema(tenkan)
+        self.kijun = RollingExtrema(kijun)
+        self.senkou = RollingExtrema(senkou)
+        self.tenkan_sen = deque(maxlen=(senkou_lead + 1))
+        self.kijun_sen = deque(maxlen=(senkou_lead + 1))
+        self.lag_values = deque(maxlen=senkou_lead)
+        self.chikou_values = deque(maxlen=chikou)
+        self.lines = None
+
+    def update(self, value):
+        """ Add a value and get the lines, or None before there are enough
+        values.
+        """
+
+        self.tenkan.update(value)
+        self.kijun.update(value)
+        self.tenkan_sen.append(
+            (self.tenkan.get_max() + self.tenkan.get_min()) / 2.0)
+        self.kijun_sen.append(
+            (self.kijun.get_max() + self.kijun.get_min()) / 2.0)
+
+        if len(self.lag_values) == self.lag_values.maxlen:
+            # Value leaving the lead enters the lagged senkou window.
+            self.senkou.update(self.lag_values[0])
+        self.lag_values.append(value)
+        self.chikou_values.append(value)
+
+        if self.senkou.count == 0 or \
+                len(self.chikou_values) < self.chikou_values.maxlen:
+            return None
+
+        senkou_span_a = (self.tenkan_sen[0] + self.kijun_sen[0]) / 2.0
+        senkou_span_b = (self.senkou.get_max() + self.senkou.get_min()) / 2.0
+        self.lines = (self.tenkan_sen[-1], self.kijun_sen[-1], senkou_span_a,
+                      senkou_span_b, self.chikou_values[0])
+
+        return self.lines
+
+
 class IchimokuStrategy:
-    """ RSI strategy. """
+    """ Ichimoku strategy.
+
+    With streaming, the lines are the ones of every value given to update,
+    instead of the ones of each window.
+    """
 
-    def __init__(self, tenkan=9, kijun=26, senkou=52, chikou=26):
+    def __init__(self, tenkan=9, kijun=26, senkou=52, chikou=26,
+                 senkou_lead=26, streaming=False):
         self.tenkan = tenkan
         self.kijun = kijun
         self.senkou = senkou
         self.chikou = chikou
+        self.senkou_lead = senkou_lead
+        self.streaming = streaming
+        self.stream = IchimokuStream(tenkan, kijun, senkou, senkou_lead,
+                                     chikou)
+
+    def update(self, value):
+        """ Add the last ticker value to the streaming lines. """
+
+        if self.streaming:
+            self.stream.update(value)
+
+    def get_lines(self, ticker_data):
+        """ Get the current lines, or None before the stream has them. """
+
+        if self.streaming:
+            return self.stream.lines
+
+        return compute_ichimoku(ticker_data, self.tenkan, self.kijun,
+                                self.senkou, self.senkou_lead, self.chikou)
 
     def should_buy(self, ticker_data):
         """ Check if we should buy. """
-        tenkan_sen, kijun_sen, senkou_span_a, senkou_span_b = \
-            compute_ichimoku(ticker_data)[:4]
+
+        lines = self.get_lines(ticker_data)
+        if lines is None:
+            return False
+
+        tenkan_sen, kijun_sen, senkou_span_a, senkou_span_b = lines[:4]
 
         return tenkan_sen >= kijun_sen and senkou_span_a >= senkou_span_b
 
     def should_sell(self, ticker_data):
         """ Check if we should sell. """
 
-        tenkan_sen, kijun_sen, senkou_span_a, senkou_span_b = \
-            compute_ichimoku(ticker_data)[:4]
+        lines = self.get_lines(ticker_data)
+        if lines is None:
+            return False
+
+        tenkan_sen, kijun_sen, senkou_span_a, senkou_span_b = lines[:4]
 
         return tenkan_sen < kijun_sen and senkou_span_a < senkou_span_b
+
+    def compute_signals(self, ticker_series, window=None):
+        """ Check if we should buy or sell at every tick of a series.
+
+        Windows are the senkou + senkou_lead values up to each tick, the
+        span of the lines, and ticks before a full window never buy or sell.
+        Without streaming, the ticker window of the event loop, of window
+        values if set, must hold the span.
+        """
+
+        if window is not None and not self.streaming and \
+                window < self.senkou + self.senkou_lead:
+            raise ValueError("Ichimoku lines span %d values, not %d." %
+                             (self.senkou + self.senkou_lead, window))
+
+        buy = np.zeros(len(ticker_series), dtype=bool)
+        sell = np.zeros(len(ticker_series), dtype=bool)
+
+        if len(ticker_series) < self.senkou + self.senkou_lead:
+            return buy, sell
+
+        tenkan_sen, kijun_sen, senkou_span_a, senkou_span_b = \
+            compute_ichimoku_series(ticker_series, self.tenkan, self.kijun,
+                                    self.senkou, self.senkou_lead,
+                                    self.chikou)[:4]
+
+        start = len(ticker_series) - len(tenkan_sen)
+        buy[start:] = (tenkan_sen >= kijun_sen) & \
+            (senkou_span_a >= senkou_span_b)
+        sell[start:] = (tenkan_sen < kijun_sen) & \
+            (senkou_span_a < senkou_span_b)
+
+        return buy, sell
@@ -1,42 +1,177 @@
-from sklearn import linear_model
+from collections import deque
 
 import numpy as np
 
 
-def compute_linear_regression(data, time_sequence=None):
-    """ Compute linear regression. """
+def _predict(count, sum_x, sum_xx, sum_y, sum_xy, x):
+    """ Predict y at x with the least squares line of count points, from
+    the sums of their x, x * x, y and x * y.
+    """
+
+    mean_x = sum_x / count
+    mean_y = sum_y / count
+    variance = sum_xx - sum_x * mean_x
+    slope = 0.0
+
+    if variance != 0:
+        slope = (sum_xy - sum_x * mean_y) / variance
+
+    return mean_y + slope * (x - mean_x)
+
+
+def compute_linear_regression(data, time_sequence=None, use_sklearn=False):
+    """ Compute linear regression.
+
+    Fits data over time_sequence and predicts the value at len(data) + 5.
+    The fit is closed form, unless use_sklearn is set.
+    """
 
     if time_sequence is None:
         time_sequence = range(len(data))
 
-    regr = linear_model.LinearRegression()
-    data_X = np.array(time_sequence[:len(data)]).reshape(-1, 1)
-    regr.fit(data_X, data)
-    result = regr.predict(np.array([len(data) + 5]).reshape(-1, 1))[0]
+    if use_sklearn:
+        from sklearn import linear_model
+
+        regr = linear_model.LinearRegression()
+        data_X = np.array(time_sequence[:len(data)]).reshape(-1, 1)
+        regr.fit(data_X, data)
+
+        return regr.predict(np.array([len(data) + 5]).reshape(-1, 1))[0]
+
+    x = np.asarray(time_sequence[:len(data)], dtype=np.float64)
+    y = np.asarray(data, dtype=np.float64)
+
+    return _predict(len(y), np.sum(x), np.sum(x * x), np.sum(y),
+                    np.sum(x * y), len(y) + 5)
+
+
+def compute_linear_regression_series(data, periods):
+    """ Compute linear regression of every window of periods values.
+
+    Item i is compute_linear_regression(data[i:(i + periods)]).
+    """
+
+    x = np.arange(periods, dtype=np.float64)
+    y = np.lib.stride_tricks.sliding_window_view(
+        np.asarray(data, dtype=np.float64), periods)
+
+    return _predict(periods, np.sum(x), np.sum(x * x), np.sum(y, axis=1),
+                    np.sum(y * x, axis=1), periods + 5)
+
+
+class LinearRegressionStream:
+    """ Linear regression of the last periods values of a stream, updated
+    in constant time per value.
+
+    Keeps the sums of y and x * y over the window, with x counted from the
+    oldest value, and recomputes them once every periods values so rounding
+    errors do not build up. Predictions are the ones of
+    compute_linear_regression over the window, up to rounding.
+    """
+
+    def __init__(self, periods):
+        self.periods = periods
+        self.values = deque(maxlen=periods)
+        self.sum_y = 0.0
+        self.sum_xy = 0.0
+        self.count = 0
+        self.prediction = None
+
+    def update(self, value):
+        """ Add a value and get the prediction. """
+
+        value = float(value)
+        size = len(self.values)
+
+        if size == self.periods:
+            # Every x decreases by one as the oldest value leaves.
+            self.sum_y -= self.values[0]
+            self.sum_xy -= self.sum_y
+            size -= 1
+
+        self.values.append(value)
+        self.sum_y += value
+        self.sum_xy += size * value
+        self.count += 1
+
+        if self.count % self.periods == 0:
+            y = np.array(self.values)
+            self.sum_y = np.sum(y)
+            self.sum_xy = np.sum(np.arange(len(y)) * y)
 
-    return result
+        size += 1
+        sum_x = size * (size - 1) / 2.0
+        sum_xx = (size - 1) * size * (2 * size - 1) / 6.0
+        self.prediction = _predict(size, sum_x, sum_xx, self.sum_y,
+                                   self.sum_xy, size + 5)
+
+        return self.prediction
 
 
 class LinearRegressionStrategy:
-    """ Linear regression strategy. """
+    """ Linear regression strategy.
+
+    With streaming, the prediction is updated with every value given to
+    update, instead of fitted on each window.
+    """
 
-    def __init__(self, periods=15, trade_fee=0):
+    def __init__(self, periods=15, trade_fee=0, streaming=False):
         self.periods = periods
         self.trade_fee = trade_fee
         self.time_sequence = range(periods)
+        self.streaming = streaming
+        self.stream = LinearRegressionStream(periods)
+
+    def update(self, value):
+        """ Add the last ticker value to the streaming prediction. """
+
+        if self.streaming:
+            self.stream.update(value)
+
+    def get_prediction(self, ticker_data):
+        """ Get the current prediction, or None before the stream has one.
+        """
+
+        if self.streaming:
+            return self.stream.prediction
+
+        return compute_linear_regression(
+            ticker_data[-self.periods:], self.time_sequence)
 
     def should_buy(self, ticker_data):
         """ Check if we should buy. """
 
-        result = compute_linear_regression(
-            ticker_data[-self.periods:], self.time_sequence)
+        result = self.get_prediction(ticker_data)
 
-        return result * (1 + self.trade_fee) > ticker_data[-1]
+        return result is not None and \
+            result * (1 + self.trade_fee) > ticker_data[-1]
 
     def should_sell(self, ticker_data):
         """ Check if we should sell. """
 
-        result = compute_linear_regression(
-            ticker_data[-self.periods:], self.time_sequence)
+        result = self.get_prediction(ticker_data)
+
+        return result is not None and \
+            result * (1 - self.trade_fee) < ticker_data[-1]
+
+    def compute_signals(self, ticker_series, window=None):
+        """ Check if we should buy or sell at every tick of a series.
+
+        Ticks without periods values up to them never buy or sell. Without
+        streaming, fits span at most window values, the size of the ticker
+        window of the event loop, if set.
+        """
+
+        ticker_series = np.asarray(ticker_series)
+        result = np.full(len(ticker_series), np.nan)
+        periods = self.periods
+        if window is not None and not self.streaming:
+            # The event loop only has window values.
+            periods = min(periods, window)
+
+        if len(ticker_series) >= periods:
+            result[(periods - 1):] = compute_linear_regression_series(
+                ticker_series, periods)
 
-        return result * (1 - self.trade_fee) < ticker_data[-1]
+        return result * (1 + self.trade_fee) > ticker_series, \
+            result * (1 - self.trade_fee) < ticker_series
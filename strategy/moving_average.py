@@ -1,23 +1,102 @@
 import numpy as np
+from strategy.rolling import ExponentialMean, exponential_mean, RollingMean, \
+    rolling_mean
+
+
+def get_average(exponential, period):
+    """ Get a streaming moving average. """
+
+    if exponential:
+        return ExponentialMean(period)
+
+    return RollingMean(period)
+
+
+def compute_average_series(ticker_series, exponential, period,
+                           window=None):
+    """ Compute the moving average at every tick of a series.
+
+    Simple averages are NaN before period values, and span at most window
+    values, if set.
+    """
+
+    if exponential:
+        return exponential_mean(ticker_series, period)
+
+    if window is not None:
+        period = min(period, window)
+
+    result = np.full(len(ticker_series), np.nan)
+    if len(ticker_series) >= period:
+        result[(period - 1):] = rolling_mean(ticker_series, period)
+
+    return result
 
 
 class MovingAverageStrategy:
-    """ Moving average strategy. """
+    """ Moving average strategy.
 
-    def __init__(self, periods=15, trade_fee=0):
+    The simple average is the one of the last periods values of each
+    window, or of the stream with streaming. The exponential average is
+    the one of every value given to update.
+    """
+
+    def __init__(self, periods=15, trade_fee=0, exponential=False,
+                 streaming=False):
         self.periods = periods
         self.trade_fee = trade_fee
+        self.exponential = exponential
+        self.streaming = streaming or exponential
+        self.average = get_average(exponential, periods)
+
+    def update(self, value):
+        """ Add the last ticker value to the streaming average. """
+
+        if self.streaming:
+            self.average.update(value)
+
+    def get_average(self, ticker_data):
+        """ Get the current average, or None before the stream has one. """
+
+        if self.streaming:
+            return self.average.mean
+
+        return np.mean(ticker_data[-self.periods:], dtype=np.float64)
 
     def should_buy(self, ticker_data):
         """ Check if we should buy. """
 
-        result = np.mean(ticker_data[-self.periods:])
-        return (ticker_data[-1] * (1 + self.trade_fee) < result) and \
-               (ticker_data[-1] > ticker_data[-2])
+        result = self.get_average(ticker_data)
+        return result is not None and \
+            (ticker_data[-1] * (1 + self.trade_fee) < result) and \
+            (ticker_data[-1] > ticker_data[-2])
 
     def should_sell(self, ticker_data):
         """ Check if we should sell. """
 
-        result = np.mean(ticker_data[-self.periods:])
-        return (ticker_data[-1] * (1 - self.trade_fee) > result) and \
-               (ticker_data[-1] < ticker_data[-2])
+        result = self.get_average(ticker_data)
+        return result is not None and \
+            (ticker_data[-1] * (1 - self.trade_fee) > result) and \
+            (ticker_data[-1] < ticker_data[-2])
+
+    def compute_signals(self, ticker_series, window=None):
+        """ Check if we should buy or sell at every tick of a series.
+
+        The first tick never buys or sells. Without streaming, simple
+        averages span at most window values, the size of the ticker window
+        of the event loop, if set.
+        """
+
+        if self.streaming:
+            window = None
+
+        ticker_series = np.asarray(ticker_series)
+        result = compute_average_series(ticker_series, self.exponential,
+                                        self.periods, window)
+        rising = np.zeros(len(ticker_series), dtype=bool)
+        falling = np.zeros(len(ticker_series), dtype=bool)
+        rising[1:] = ticker_series[1:] > ticker_series[:-1]
+        falling[1:] = ticker_series[1:] < ticker_series[:-1]
+
+        return (ticker_series * (1 + self.trade_fee) < result) & rising, \
+            (ticker_series * (1 - self.trade_fee) > result) & falling
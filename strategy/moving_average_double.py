@@ -1,10 +1,15 @@
 import numpy as np
+from strategy.moving_average import compute_average_series, get_average
 
 
 class MovingAverageDoubleStrategy:
-    """ Double moving average strategy. """
+    """ Double moving average strategy.
 
-    def __init__(self, period_1=9, period_2=21, trade_fee=0):
+    Averages are simple or exponential, as in MovingAverageStrategy.
+    """
+
+    def __init__(self, period_1=9, period_2=21, trade_fee=0,
+                 exponential=False, streaming=False):
         if period_1 > period_2:
             self.period_max = period_1
             self.period_min = period_2
@@ -13,19 +18,69 @@ class MovingAverageDoubleStrategy:
             self.period_min = period_1
 
         self.trade_fee = trade_fee
+        self.exponential = exponential
+        self.streaming = streaming or exponential
+        self.average_min = get_average(exponential, self.period_min)
+        self.average_max = get_average(exponential, self.period_max)
+
+    def update(self, value):
+        """ Add the last ticker value to the streaming averages. """
+
+        if self.streaming:
+            self.average_min.update(value)
+            self.average_max.update(value)
+
+    def get_averages(self, ticker_data):
+        """ Get the current averages, or None before the streams have them.
+        """
+
+        if self.streaming:
+            if self.average_min.mean is None:
+                return None
+
+            return self.average_min.mean, self.average_max.mean
+
+        return (np.mean(ticker_data[-self.period_min:], dtype=np.float64),
+                np.mean(ticker_data[-self.period_max:], dtype=np.float64))
 
     def should_buy(self, ticker_data):
         """ Check if we should buy. """
 
-        result_min = np.mean(ticker_data[-self.period_min:])
-        result_max = np.mean(ticker_data[-self.period_max:])
+        averages = self.get_averages(ticker_data)
+        if averages is None:
+            return False
+
+        result_min, result_max = averages
 
         return (result_min * (1 + self.trade_fee) < result_max)
 
     def should_sell(self, ticker_data):
         """ Check if we should sell. """
 
-        result_min = np.mean(ticker_data[-self.period_min:])
-        result_max = np.mean(ticker_data[-self.period_max:])
+        averages = self.get_averages(ticker_data)
+        if averages is None:
+            return False
+
+        result_min, result_max = averages
 
         return (result_min * (1 - self.trade_fee) > result_max)
+
+    def compute_signals(self, ticker_series, window=None):
+        """ Check if we should buy or sell at every tick of a series.
+
+        Ticks without period_max values up to them never buy or sell with
+        simple averages. Without streaming, simple averages span at most
+        window values, the size of the ticker window of the event loop, if
+        set.
+        """
+
+        if self.streaming:
+            window = None
+
+        result_min = compute_average_series(ticker_series, self.exponential,
+                                            self.period_min, window)
+        result_max = compute_average_series(ticker_series, self.exponential,
+                                            self.period_max, window)
+
+        return result_min * (1 + self.trade_fee) < result_max, \
+            result_min * (1 - self.trade_fee) > result_max
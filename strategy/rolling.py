@@ -0,0 +1,179 @@
+'''
+Rolling minimum, maximum and means of series.
+'''
+
+from collections import deque
+
+import numpy as np
+
+SMOOTH_BLOCK = 64  # values smoothed per matrix product.
+
+
+class RollingExtrema:
+    """ Minimum and maximum of the last size values of a stream.
+
+    Monotonic deques keep the candidates of each extremum, so updates are
+    O(1) amortized.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.count = 0
+        self.mins = deque()
+        self.maxs = deque()
+
+    def update(self, value):
+        """ Add a value, dropping the one size values back. """
+
+        while len(self.maxs) > 0 and self.maxs[-1][1] <= value:
+            self.maxs.pop()
+        self.maxs.append((self.count, value))
+
+        while len(self.mins) > 0 and self.mins[-1][1] >= value:
+            self.mins.pop()
+        self.mins.append((self.count, value))
+
+        self.count += 1
+        first = self.count - self.size
+
+        if self.maxs[0][0] < first:
+            self.maxs.popleft()
+        if self.mins[0][0] < first:
+            self.mins.popleft()
+
+    def get_min(self):
+        return self.mins[0][1]
+
+    def get_max(self):
+        return self.maxs[0][1]
+
+
+def _rolling(data, size, partial, reduce, accumulate):
+    data = np.asarray(data)
+    if partial:
+        size = min(size, data.shape[-1])
+    result = reduce(np.lib.stride_tricks.sliding_window_view(
+        data, size, axis=-1), axis=-1)
+
+    if partial and size > 1:
+        # Windows running past the end only hold the rest of the values.
+        tail = accumulate(data[..., :-size:-1], axis=-1)[..., ::-1]
+        result = np.concatenate((result, tail), axis=-1)
+
+    return result
+
+
+def rolling_min(data, size, partial=False):
+    """ Get min(data[..., i:(i + size)]) of every full window along the
+    last axis, or of every start i when partial is set.
+    """
+
+    return _rolling(data, size, partial, np.min, np.minimum.accumulate)
+
+
+def rolling_max(data, size, partial=False):
+    """ Get max(data[..., i:(i + size)]) of every full window along the
+    last axis, or of every start i when partial is set.
+    """
+
+    return _rolling(data, size, partial, np.max, np.maximum.accumulate)
+
+
+class RollingMean:
+    """ Mean of the last size values of a stream, updated in constant time.
+
+    Keeps the sum of the window, recomputed once every size values so
+    rounding errors do not build up.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.count = 0
+        self.mean = None
+
+    def update(self, value):
+        """ Add a value and get the mean of the window. """
+
+        value = float(value)
+
+        if len(self.values) == self.size:
+            self.total -= self.values[0]
+
+        self.values.append(value)
+        self.total += value
+        self.count += 1
+
+        if self.count % self.size == 0:
+            self.total = float(np.sum(self.values))
+
+        self.mean = self.total / len(self.values)
+
+        return self.mean
+
+
+class ExponentialMean:
+    """ Exponential moving average of a stream, with weight
+    2 / (period + 1) for the last value, starting from the first one.
+    """
+
+    def __init__(self, period):
+        self.alpha = 2.0 / (period + 1)
+        self.mean = None
+
+    def update(self, value):
+        """ Add a value and get the mean. """
+
+        value = float(value)
+
+        if self.mean is None:
+            self.mean = value
+        else:
+            self.mean += self.alpha * (value - self.mean)
+
+        return self.mean
+
+
+def rolling_mean(data, size):
+    """ Get the mean of data[i:(i + size)] of every full window, from
+    cumulative sums.
+    """
+
+    sums = np.concatenate(([0.0], np.cumsum(data, dtype=np.float64)))
+
+    return (sums[size:] - sums[:-size]) / size
+
+
+def exponential_mean(data, period):
+    """ Get the exponential moving average at every value of a series.
+
+    Same as ExponentialMean updated with each value, up to rounding. Each
+    block of values is smoothed from zero with a matrix product, and only
+    the carry between blocks is a Python loop.
+    """
+
+    values = np.asarray(data, dtype=np.float64)
+    size = len(values)
+    if size == 0:
+        return np.zeros(0)
+
+    alpha = 2.0 / (period + 1)
+    powers = (1 - alpha) ** np.arange(SMOOTH_BLOCK + 1)
+    lags = np.subtract.outer(np.arange(SMOOTH_BLOCK), np.arange(SMOOTH_BLOCK))
+    kernel = np.where(lags >= 0, powers[np.abs(lags)], 0) * alpha
+
+    blocks = np.zeros(-(-size // SMOOTH_BLOCK) * SMOOTH_BLOCK)
+    blocks[:size] = values
+    blocks = np.dot(blocks.reshape(-1, SMOOTH_BLOCK), kernel.T)
+
+    # Mean before each block, starting from the first value.
+    carries = []
+    last, decay = (float(values[0]), float(powers[SMOOTH_BLOCK]))
+    for block_last in blocks[:, -1].tolist():
+        carries.append(last)
+        last = decay * last + block_last
+
+    blocks += np.array(carries)[:, None] * powers[1:]
+
+    return blocks.reshape(-1)[:size]
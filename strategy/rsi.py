@@ -1,6 +1,9 @@
 import numpy as np
 from six.moves import range
 from six.moves import zip
+from strategy.rolling import RollingMean
+
+SMOOTH_BLOCK = 64  # values smoothed per matrix product.
 
 
 def compute_rsi_series(data, period=None):
@@ -75,6 +78,223 @@ def compute_rsi_series(data, period=None):
     return rsi[::-1]
 
 
+def _smooth_wilder(values, period, initial):
+    """ Apply avg = (avg * (period - 1) + value) / period to every value,
+    starting from initial, in blocks of matrix products.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    alpha = (period - 1.0) / period
+    powers = alpha ** np.arange(SMOOTH_BLOCK + 1)
+    lags = np.subtract.outer(np.arange(SMOOTH_BLOCK), np.arange(SMOOTH_BLOCK))
+    kernel = np.where(lags >= 0, powers[np.abs(lags)], 0) / period
+
+    result = np.zeros(len(values))
+    last = initial
+
+    for start in range(0, len(values), SMOOTH_BLOCK):
+        block = values[start:(start + SMOOTH_BLOCK)]
+        size = len(block)
+        result[start:(start + size)] = powers[1:(size + 1)] * last + \
+            np.dot(kernel[:size, :size], block)
+        last = result[start + size - 1]
+
+    return result
+
+
+def _get_gains_losses(data):
+    changes = np.diff(np.asarray(data), axis=-1)
+    gains = np.where(changes < 0, 0, changes).astype(np.float64)
+    losses = np.where(changes > 0, 0, np.abs(changes)).astype(np.float64)
+
+    return gains, losses
+
+
+def _get_rsi(avg_gain, avg_loss):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+
+    return np.where(avg_loss == 0, 100, rsi)
+
+
+def compute_rsi_array(data, period=None):
+    """ Compute RSI series of a whole history.
+
+    Same as compute_rsi_series, oldest value first.
+    """
+
+    if period is None:
+        period = len(data)
+
+    period = int(period)
+    gains, losses = _get_gains_losses(data)
+    avg_gain = np.mean(gains[:period])
+    avg_loss = np.mean(losses[:period])
+
+    avg_gain = np.concatenate((
+        [avg_gain], _smooth_wilder(gains[period:], period, avg_gain)))
+    avg_loss = np.concatenate((
+        [avg_loss], _smooth_wilder(losses[period:], period, avg_loss)))
+
+    return _get_rsi(avg_gain, avg_loss)
+
+
+def compute_rsi_windows(data, period=None, window=None):
+    """ Compute RSI series of every window of a history.
+
+    Row i is compute_rsi_series(data[i:(i + window)], period), newest value
+    first. window defaults to period.
+    """
+
+    if period is None:
+        period = len(data)
+
+    if window is None:
+        window = period
+
+    period = int(period)
+    gains, losses = _get_gains_losses(data)
+    gains = np.lib.stride_tricks.sliding_window_view(gains, window - 1)
+    losses = np.lib.stride_tricks.sliding_window_view(losses, window - 1)
+
+    size = 1 + max(window - period - 1, 0)
+    avg_gain = np.zeros((len(gains), size))
+    avg_loss = np.zeros((len(losses), size))
+    avg_gain[:, 0] = np.mean(gains[:, :period], axis=1)
+    avg_loss[:, 0] = np.mean(losses[:, :period], axis=1)
+
+    # Same recurrence as compute_rsi_series, for all windows at once.
+    for idx in range(1, size):
+        avg_gain[:, idx] = (avg_gain[:, idx - 1] * (period - 1) +
+                            gains[:, idx + (period - 1)]) / period
+        avg_loss[:, idx] = (avg_loss[:, idx - 1] * (period - 1) +
+                            losses[:, idx + (period - 1)]) / period
+
+    return _get_rsi(avg_gain, avg_loss)[:, ::-1]
+
+
+class RsiStream:
+    """ RSI of a growing series, updated in constant time per value.
+
+    Keeps Wilder's smoothed average gain and loss. After period + 1 values,
+    update returns the latest item of compute_rsi_series over all values
+    so far, computed with the same operations.
+    """
+
+    def __init__(self, period):
+        self.period = int(period)
+        self.last_value = None
+        self.gains = []
+        self.losses = []
+        self.avg_gain = None
+        self.avg_loss = None
+        self.rsi = None
+
+    def update(self, value):
+        """ Add a value and get the RSI, or None before period changes. """
+
+        if self.last_value is None:
+            self.last_value = value
+            return None
+
+        change = value - self.last_value
+        self.last_value = value
+        gain = 0 if change < 0 else change
+        loss = 0 if change > 0 else abs(change)
+
+        if self.avg_gain is None:
+            self.gains.append(gain)
+            self.losses.append(loss)
+
+            if len(self.gains) < self.period:
+                return None
+
+            avg_gain = np.mean(self.gains)
+            avg_loss = np.mean(self.losses)
+            self.gains, self.losses = ([], [])
+        else:
+            avg_gain = ((self.avg_gain * (self.period - 1) + gain) /
+                        self.period)
+            avg_loss = ((self.avg_loss * (self.period - 1) + loss) /
+                        self.period)
+
+        self.avg_gain, self.avg_loss = (avg_gain, avg_loss)
+
+        # Gains and losses are not negative, so 1 + rs is never 0.
+        if avg_loss == 0:
+            self.rsi = 100
+        else:
+            self.rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+
+        return self.rsi
+
+
+def compute_rsi_rolling(data, period):
+    """ Compute RSI of every window of period values.
+
+    Item i is compute_rsi(data[i:(i + period)], period), so the average
+    gain and loss are simple means over the period - 1 changes of a window.
+    """
+
+    data = np.asarray(data)
+    changes = np.diff(data).astype(np.float64)
+    gains = np.maximum(changes, 0)
+    losses = np.maximum(-changes, 0)
+    window = max(min(period, len(data)) - 1, 1)
+
+    avg_gain = np.lib.stride_tricks.sliding_window_view(
+        gains, window).mean(axis=1)
+    avg_loss = np.lib.stride_tricks.sliding_window_view(
+        losses, window).mean(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+    rsi[avg_loss == 0] = 100
+
+    return rsi
+
+
+class RollingRsiStream:
+    """ RSI of the last period values of a stream, updated in constant time
+    per value.
+
+    Keeps rolling means of the period - 1 gains and losses of the window.
+    Once there are period values, update returns compute_rsi of the last
+    period values, up to rounding, as compute_rsi_rolling does for a whole
+    series.
+    """
+
+    def __init__(self, period):
+        self.period = int(period)
+        self.size = max(self.period - 1, 1)
+        self.last_value = None
+        self.avg_gain = RollingMean(self.size)
+        self.avg_loss = RollingMean(self.size)
+        self.rsi = None
+
+    def update(self, value):
+        """ Add a value and get the RSI, or None before period values. """
+
+        if self.last_value is None:
+            self.last_value = value
+            return None
+
+        change = float(value) - float(self.last_value)
+        self.last_value = value
+        avg_gain = self.avg_gain.update(max(change, 0.0))
+        avg_loss = self.avg_loss.update(max(-change, 0.0))
+
+        if len(self.avg_gain.values) < self.size:
+            return None
+
+        if avg_loss == 0:
+            self.rsi = 100
+        else:
+            self.rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+
+        return self.rsi
+
+
 def compute_rsi(data, period=None):
     """ Relative Strength Index.
 
@@ -89,21 +309,62 @@ def compute_rsi(data, period=None):
 
 
 class RsiStrategy:
-    """ RSI strategy. """
+    """ RSI strategy.
+
+    The RSI is the one of the last periods values of each window, or of
+    the values given to update with streaming, updated in constant time.
+    """
 
-    def __init__(self, periods=15, buy_rate=20, sell_rate=80):
+    def __init__(self, periods=15, buy_rate=20, sell_rate=80,
+                 streaming=False):
         self.periods = periods
         self.buy_rate = buy_rate
         self.sell_rate = sell_rate
+        self.streaming = streaming
+        self.stream = RollingRsiStream(periods)
+
+    def update(self, value):
+        """ Add the last ticker value to the streaming RSI. """
+
+        if self.streaming:
+            self.stream.update(value)
+
+    def get_rsi(self, ticker_data):
+        """ Get the current RSI, or None before the stream has one. """
+
+        if self.streaming:
+            return self.stream.rsi
+
+        return compute_rsi(ticker_data[-self.periods:], self.periods)
 
     def should_buy(self, ticker_data):
         """ Check if we should buy. """
 
-        result = compute_rsi(ticker_data[-self.periods:], self.periods)
-        return result <= self.buy_rate
+        result = self.get_rsi(ticker_data)
+        return result is not None and result <= self.buy_rate
 
     def should_sell(self, ticker_data):
         """ Check if we should sell. """
 
-        result = compute_rsi(ticker_data[-self.periods:], self.periods)
-        return result >= self.sell_rate
+        result = self.get_rsi(ticker_data)
+        return result is not None and result >= self.sell_rate
+
+    def compute_signals(self, ticker_series, window=None):
+        """ Check if we should buy or sell at every tick of a series.
+
+        Ticks without periods values up to them never buy or sell. Without
+        streaming, the RSI spans at most window values, the size of the
+        ticker window of the event loop, if set.
+        """
+
+        result = np.full(len(ticker_series), np.nan)
+        periods = self.periods
+        if window is not None and not self.streaming:
+            # The event loop only has window values.
+            periods = min(periods, window)
+
+        if len(ticker_series) >= periods:
+            result[(periods - 1):] = compute_rsi_rolling(ticker_series,
+                                                         periods)
+
+        return result <= self.buy_rate, result >= self.sell_rate
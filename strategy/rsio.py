@@ -1,5 +1,6 @@
 import numpy as np
-from strategy.rsi import compute_rsi_series
+from strategy.rolling import rolling_max, rolling_min
+from strategy.rsi import compute_rsi_series, compute_rsi_windows
 
 
 def compute_k_series(data, filter_size=0, k_size=0):
@@ -13,21 +14,16 @@ def compute_k_series(data, filter_size=0, k_size=0):
     if k_size > data_size or k_size == 0:
         k_size = filter_size
 
-    k_list = []
+    if k_size == 0:
+        return []
 
-    for i in range(k_size):
-        try:
-            min_data = np.min(data[i:(filter_size + i)])
-            range_data = np.max(data[i:(filter_size + i)]) - min_data
-            if range_data == 0:
-                range_data = 1.0
+    data = np.asarray(data)
+    min_data = rolling_min(data, filter_size, partial=True)[:k_size]
+    range_data = rolling_max(data, filter_size, partial=True)[:k_size] - \
+        min_data
+    range_data[range_data == 0] = 1.0
 
-            k = (data[i] - min_data) / range_data
-            k_list.append(k)
-        except Exception:
-            break
-
-    return k_list
+    return list((data[:k_size] - min_data) / range_data)
 
 
 def compute_k_d(data, k_size, d_size):
@@ -47,6 +43,30 @@ def compute_k_d(data, k_size, d_size):
     return k, d
 
 
+def compute_k_d_windows(data, k_size, d_size):
+    """ Compute K and D of every row of a (rows, size) array.
+
+    Same as compute_k_d of each row.
+    """
+
+    data = np.asarray(data, dtype=np.float64)
+    data_size = data.shape[1]
+    k_size = min(k_size, data_size)
+    d_size = min(d_size, data_size)
+
+    filter_size = k_size
+    if filter_size == 0:
+        filter_size = data_size
+
+    min_data = rolling_min(data, filter_size, partial=True)
+    range_data = rolling_max(data, filter_size, partial=True) - min_data
+    range_data[range_data == 0] = 1.0
+    k_series = (data[:, :filter_size] - min_data[:, :filter_size]) / \
+        range_data[:, :filter_size]
+
+    return k_series[:, -1], np.mean(k_series[:, :d_size], axis=1)
+
+
 class RsiOscillatorStrategy:
     """ RSIO strategy. """
 
@@ -75,3 +95,28 @@ class RsiOscillatorStrategy:
                            self.d_oscillator_period)
 
         return result[0] >= self.sell_rate and k <= d
+
+    def compute_signals(self, ticker_series, window=None):
+        """ Check if we should buy or sell at every tick of a series.
+
+        Ticks without periods values up to them never buy or sell. The RSI
+        spans at most window values, the size of the ticker window of the
+        event loop, if set.
+        """
+
+        buy = np.zeros(len(ticker_series), dtype=bool)
+        sell = np.zeros(len(ticker_series), dtype=bool)
+        periods = self.periods
+        if window is not None:
+            # The event loop only has window values.
+            periods = min(periods, window)
+
+        if len(ticker_series) >= periods:
+            result = compute_rsi_windows(ticker_series, periods)
+            k, d = compute_k_d_windows(result, self.k_oscillator_period,
+                                       self.d_oscillator_period)
+            buy[(periods - 1):] = (result[:, 0] <= self.buy_rate) & (k >= d)
+            sell[(periods - 1):] = (result[:, 0] >= self.sell_rate) & \
+                (k <= d)
+
+        return buy, sell
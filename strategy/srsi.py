@@ -1,5 +1,5 @@
 import numpy as np
-from strategy.rsi import compute_rsi_series
+from strategy.rsi import compute_rsi_series, compute_rsi_windows
 
 
 def compute_srsi(data, period=None):
@@ -23,6 +23,21 @@ def compute_srsi(data, period=None):
     return rsi
 
 
+def compute_srsi_windows(data, period=None, window=None):
+    """ Compute SRSI of every window of a history.
+
+    Item i is compute_srsi(data[i:(i + window)], period). window defaults
+    to period.
+    """
+
+    rsi = compute_rsi_windows(data, period, window)
+    rsi_min = np.min(rsi, axis=1)
+    rsi_range = np.max(rsi, axis=1) - rsi_min
+    rsi_range[rsi_range == 0] = 1
+
+    return (rsi[:, -1] - rsi_min) * 100.0 / rsi_range
+
+
 class SRsiStrategy:
     """ SRSI strategy. """
 
@@ -42,3 +57,23 @@ class SRsiStrategy:
 
         result = compute_srsi(ticker_data[-self.periods:], self.periods)
         return result >= self.sell_rate
+
+    def compute_signals(self, ticker_series, window=None):
+        """ Check if we should buy or sell at every tick of a series.
+
+        Ticks without periods values up to them never buy or sell. The SRSI
+        spans at most window values, the size of the ticker window of the
+        event loop, if set.
+        """
+
+        result = np.full(len(ticker_series), np.nan)
+        periods = self.periods
+        if window is not None:
+            # The event loop only has window values.
+            periods = min(periods, window)
+
+        if len(ticker_series) >= periods:
+            result[(periods - 1):] = compute_srsi_windows(ticker_series,
+                                                          periods)
+
+        return result <= self.buy_rate, result >= self.sell_rate
@@ -1,6 +1,6 @@
 import numpy as np
-from strategy.rsi import compute_rsi_series
-from strategy.rsio import compute_k_d
+from strategy.rsi import compute_rsi_series, compute_rsi_windows
+from strategy.rsio import compute_k_d, compute_k_d_windows
 
 
 def compute_srsi_series(data, period=None):
@@ -24,6 +24,21 @@ def compute_srsi_series(data, period=None):
     return srsi
 
 
+def compute_srsi_series_windows(data, period=None, window=None):
+    """ Compute SRSI series of every window of a history.
+
+    Row i is compute_srsi_series(data[i:(i + window)], period). window
+    defaults to period.
+    """
+
+    rsi = compute_rsi_windows(data, period, window)
+    rsi_min = np.min(rsi, axis=1)
+    rsi_range = np.max(rsi, axis=1) - rsi_min
+    rsi_range[rsi_range == 0] = 1
+
+    return (rsi - rsi_min[:, None]) * 100.0 / rsi_range[:, None]
+
+
 class SRsiOscillatorStrategy:
     """ SRSIO strategy. """
 
@@ -52,3 +67,32 @@ class SRsiOscillatorStrategy:
                            self.d_oscillator_period)
 
         return result[0] >= self.sell_rate and k <= d
+
+    def compute_signals(self, ticker_series, window=None):
+        """ Check if we should buy or sell at every tick of a series.
+
+        Ticks without periods values up to them never buy or sell. The
+        SRSI and RSI span at most window values, the size of the ticker
+        window of the event loop, if set.
+        """
+
+        buy = np.zeros(len(ticker_series), dtype=bool)
+        sell = np.zeros(len(ticker_series), dtype=bool)
+        periods = self.periods
+        if window is not None:
+            # The event loop only has window values.
+            periods = min(periods, window)
+
+        if len(ticker_series) >= periods:
+            result = compute_srsi_series_windows(ticker_series, periods)
+            k, d = compute_k_d_windows(result, self.k_oscillator_period,
+                                       self.d_oscillator_period)
+            buy[(periods - 1):] = (result[:, 0] <= self.buy_rate) & (k >= d)
+
+            result = compute_rsi_windows(ticker_series, periods)
+            k, d = compute_k_d_windows(result, self.k_oscillator_period,
+                                       self.d_oscillator_period)
+            sell[(periods - 1):] = (result[:, 0] >= self.sell_rate) & \
+                (k <= d)
+
+        return buy, sell